@@ -0,0 +1,318 @@
+import asyncio
+import json
+import urllib.parse
+import aiohttp # pip install aiohttp
+from contextlib import nullcontext
+from tqdm import tqdm
+
+from director import SERVER_ADDRESS, OUTPUT_FOLDER, CLIENT_ID, PIPELINE_DEPTH, WORKFLOW_FILE, build_jobs, write_images
+from comfy_ws import PREVIEW_IMAGE, ws_output_nodes, decode_frame
+from comfy_http import HTTP_POOL_SIZE, HTTP_TIMEOUT
+from scheduler import schedule
+from scenario_catalog import load_scenarios
+from job_metrics import METRICS_LOG, METRICS_PROM, METRICS_PORT, JobMetrics, MetricsSink
+
+# Events that arrive before their prompt_id is registered are parked here (bounded)
+MAX_ORPHAN_EVENTS = 256
+RECONNECT_ATTEMPTS = 3 # After a reset (errno 104 over the WSL2 bridge), before in-flight jobs are abandoned
+RECONNECT_DELAY = 2.0
+
+class AsyncVulcanDirector:
+    """asyncio twin of VulcanDirector: one WebSocket reader fans events out to per-prompt queues."""
+
+    def __init__(self, server_address, client_id, output_folder=OUTPUT_FOLDER, metrics=None):
+        self.server_address = server_address
+        self.client_id = client_id
+        self.output_folder = output_folder
+        self.metrics = metrics # Optional MetricsSink receiving one JobMetrics per finished job
+        self.session = None
+        self.ws = None
+        self._reader = None
+        self._listeners = {} # prompt_id -> asyncio.Queue of WebSocket messages
+        self._orphans = {}   # prompt_id -> [messages] received before registration
+        self._executing = (None, None) # (prompt_id, node) that binary frames belong to
+        self._streaming = set() # prompt_ids whose final images arrive over the socket, not /history
+        self._reconnecting = False
+        self._closing = False
+        self.abandoned = set() # prompt_ids given up on that may still be queued or running on the server
+
+    async def connect(self):
+        if self.session is None:
+            self.session = new_session()
+        try:
+            self.ws = await self.session.ws_connect(
+                f"ws://{self.server_address}/ws?clientId={self.client_id}",
+                timeout=aiohttp.ClientWSTimeout(ws_receive=None, ws_close=60), max_msg_size=0)
+            print(f"📡 Connected to Engine: {self.server_address}")
+        except Exception as e:
+            print(f"❌ Connection Failed: {e}")
+            raise
+        if self._reader: self._reader.cancel()
+        self._reader = asyncio.create_task(self._read_events(self.ws))
+
+    async def close(self):
+        self._closing = True
+        if self._reader: self._reader.cancel()
+        if self.ws: await self.ws.close()
+        if self.session: await self.session.close()
+
+    # --- EVENT DEMULTIPLEXER ---
+    async def _read_events(self, ws):
+        """The only task that reads the socket; every event is routed by its prompt_id."""
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    message = json.loads(msg.data)
+                    data = message.get('data', {})
+                    prompt_id = data.get('prompt_id')
+                    if message.get('type') == 'executing':
+                        self._executing = (prompt_id, data.get('node'))
+                    if prompt_id is not None:
+                        self._dispatch(prompt_id, message)
+                elif msg.type == aiohttp.WSMsgType.BINARY:
+                    # Binary frames carry no prompt_id; they belong to whatever is executing
+                    prompt_id, node = self._executing
+                    event_type, image_format, image = decode_frame(msg.data)
+                    if prompt_id is not None and event_type == PREVIEW_IMAGE:
+                        self._dispatch(prompt_id, {"type": "image_frame",
+                                                   "data": {"node": node, "format": image_format, "image": image}})
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    break
+        finally:
+            # A replaced socket must not touch jobs queued on its successor
+            if ws is self.ws and not self._closing:
+                self._reconnecting = True
+                asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        """Reopens the socket like VulcanDirector, then settles the prompts that finished while it was down."""
+        print(f"\n⚠️ Engine connection lost: {self.server_address}")
+        try:
+            for attempt in range(RECONNECT_ATTEMPTS):
+                print(f"🔄 Attempting to reconnect to Engine... ({attempt+1}/{RECONNECT_ATTEMPTS})")
+                try:
+                    await self.connect()
+                    break
+                except (aiohttp.ClientError, OSError, asyncio.TimeoutError):
+                    await asyncio.sleep(RECONNECT_DELAY)
+            else:
+                self.abandon()
+                return
+            for prompt_id in list(self._listeners):
+                try:
+                    entry = (await self.get_history(prompt_id)).get(prompt_id)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    entry = None
+                if entry is None:
+                    continue # Still queued or running: its events now arrive on the new socket
+                if entry.get('status', {}).get('status_str') == "error":
+                    self._dispatch(prompt_id, {"type": "execution_error", "data": {
+                        "prompt_id": prompt_id, "exception_message": "failed while the connection was down"}})
+                elif prompt_id in self._streaming:
+                    # Its images went out over the dead socket; render it again
+                    self._dispatch(prompt_id, {"type": "images_lost", "data": {"prompt_id": prompt_id}})
+                else:
+                    self._dispatch(prompt_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+        finally:
+            self._reconnecting = False
+
+    def abandon(self):
+        """Wakes every waiter with `connection_lost` so nobody hangs on a dead socket."""
+        for prompt_id, events in self._listeners.items():
+            self.abandoned.add(prompt_id)
+            events.put_nowait({"type": "connection_lost", "data": {}})
+
+    def _dispatch(self, prompt_id, message):
+        if prompt_id in self._listeners:
+            self._listeners[prompt_id].put_nowait(message)
+            return
+        parked = self._orphans.setdefault(prompt_id, [])
+        parked.append(message)
+        if len(self._orphans) > MAX_ORPHAN_EVENTS:
+            self._orphans.pop(next(iter(self._orphans)))
+
+    def _listen(self, prompt_id, streaming=False):
+        events = asyncio.Queue()
+        for message in self._orphans.pop(prompt_id, []):
+            events.put_nowait(message)
+        if not self._reconnecting and (self._reader is None or self._reader.done()):
+            # Nobody is reading the socket, so no event would ever arrive
+            self.abandoned.add(prompt_id)
+            events.put_nowait({"type": "connection_lost", "data": {}})
+        if streaming:
+            self._streaming.add(prompt_id)
+        self._listeners[prompt_id] = events
+        return events
+
+    # --- REST ---
+    async def queue_prompt(self, prompt_workflow):
+        p = {"prompt": prompt_workflow, "client_id": self.client_id}
+        async with self.session.post(f"http://{self.server_address}/prompt", json=p) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def cancel_abandoned(self):
+        """Deletes abandoned prompts from the server's queue and interrupts the one on the GPU, if any.
+
+        Run before resubmitting them elsewhere, so a server that was only unreachable for a moment
+        does not render them a second time. Prompts stay in `abandoned` until the server confirms.
+        """
+        if not self.abandoned:
+            return
+        timeout = aiohttp.ClientTimeout(total=3)
+        prompt_ids = list(self.abandoned)
+        async with self.session.post(f"http://{self.server_address}/queue", json={"delete": prompt_ids},
+                                     timeout=timeout) as resp:
+            resp.raise_for_status()
+        async with self.session.get(f"http://{self.server_address}/queue", timeout=timeout) as resp:
+            running = {item[1] for item in (await resp.json()).get('queue_running', [])}
+        for prompt_id in running & set(prompt_ids):
+            async with self.session.post(f"http://{self.server_address}/interrupt", json={"prompt_id": prompt_id},
+                                         timeout=timeout) as resp:
+                resp.raise_for_status()
+        self.abandoned.difference_update(prompt_ids)
+
+    async def get_history(self, prompt_id):
+        async with self.session.get(f"http://{self.server_address}/history/{prompt_id}") as resp:
+            return await resp.json()
+
+    async def get_image(self, filename, subfolder, folder_type):
+        params = urllib.parse.urlencode({"filename": filename, "subfolder": subfolder, "type": folder_type})
+        async with self.session.get(f"http://{self.server_address}/view?{params}",
+                                    timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    # --- JOBS ---
+    async def get_images(self, workflow, scene_name, metrics=None):
+        prompt_id = (await self.queue_prompt(workflow))['prompt_id']
+        if metrics: metrics.submitted(prompt_id)
+        streamed = {node_id: [] for node_id in ws_output_nodes(workflow)}
+        events = self._listen(prompt_id, streaming=bool(streamed))
+        pbar = None
+        try:
+            while True:
+                message = await events.get()
+                data = message['data']
+                if metrics and message['type'] != 'image_frame':
+                    metrics.on_event(message)
+                if message['type'] == 'progress':
+                    if pbar is None:
+                        pbar = tqdm(total=data['max'], desc=f"🎨 Rendering {scene_name}", unit="step")
+                    pbar.n = data['value']
+                    pbar.refresh()
+                elif message['type'] == 'image_frame':
+                    # STREAMED OUTPUT: frames from a SaveImageWebsocket node are the final images
+                    if data['node'] in streamed:
+                        streamed[data['node']].append(data['image'])
+                elif message['type'] == 'execution_error':
+                    raise RuntimeError(data.get('exception_message', 'execution error'))
+                elif message['type'] == 'connection_lost':
+                    raise ConnectionError(f"Engine connection lost while rendering {scene_name}")
+                elif message['type'] == 'images_lost':
+                    self._listeners.pop(prompt_id, None)
+                    self._streaming.discard(prompt_id)
+                    print(f"🔁 Re-rendering {scene_name}: its streamed images were lost with the connection")
+                    prompt_id = (await self.queue_prompt(workflow))['prompt_id']
+                    if metrics: metrics.submitted(prompt_id)
+                    streamed = {node_id: [] for node_id in streamed}
+                    events = self._listen(prompt_id, streaming=True)
+                elif message['type'] == 'executing' and data['node'] is None:
+                    break
+        finally:
+            if pbar: pbar.close()
+            self._listeners.pop(prompt_id, None)
+            self._streaming.discard(prompt_id)
+
+        if streamed:
+            return {node_id: {"image_bytes": images} for node_id, images in streamed.items()}
+        with metrics.phase('history') if metrics else nullcontext():
+            return (await self.get_history(prompt_id))[prompt_id]['outputs']
+
+    async def fetch_image(self, img, scene_name):
+        # RETRY LOGIC: Attempt to download 3 times if the GPU is lagging
+        for attempt in range(3):
+            try:
+                return await self.get_image(img['filename'], img['subfolder'], img['type'])
+            except Exception as e:
+                print(f"⚠️ Retrieval Attempt {attempt+1} failed: {e}. Retrying...")
+                await asyncio.sleep(5) # Wait for Windows I/O to stabilize
+
+        print(f"❌ Failed to retrieve {scene_name} after 3 attempts.")
+        return None
+
+    async def save_output(self, node_outputs, scene_name, index, variants=None, metrics=None):
+        """Resilient saving logic to handle post-generation I/O lag. Returns the saved paths."""
+        timed = metrics.phase if metrics else lambda name: nullcontext()
+        images = []
+        for node_id, output in node_outputs.items():
+            # STREAMED: images that already arrived over the WebSocket need no download
+            images.extend(output.get('image_bytes', []))
+            for img in output.get('images', []):
+                if variants is None and images:
+                    break
+                with timed('download'):
+                    data = await self.fetch_image(img, scene_name)
+                if data is not None or variants is not None:
+                    images.append(data)
+
+        with timed('write'):
+            saved = await asyncio.to_thread(write_images, self.output_folder, images, scene_name, index, variants)
+        for filename in saved:
+            print(f"✅ Successfully Retrieved: {filename}")
+        return saved
+
+    async def run_batch(self, jobs, concurrency=PIPELINE_DEPTH):
+        """Runs every job, with at most `concurrency` prompts outstanding on the server.
+
+        Twice as many workers as slots pull jobs lazily, so downloads overlap the next renders
+        while only a handful of jobs exist at once, however long the catalog.
+        """
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run_one(job):
+            metrics = JobMetrics(job['name'], job['index'], job['workflow'])
+            try:
+                # The slot is released as soon as the render finishes, so downloads overlap the next job
+                async with slots:
+                    outputs = await self.get_images(job['workflow'], job['name'], metrics)
+                saved = await self.save_output(outputs, job['name'], job['index'], job.get('variants'), metrics)
+                metrics.finish("ok" if saved else "failed")
+            except Exception as e:
+                print(f"\n⚠️ Generation failed for {job['name']}: {e}")
+                metrics.finish("failed")
+            if self.metrics:
+                self.metrics.record(metrics)
+
+        await run_bounded(jobs, run_one, concurrency * 2)
+
+async def run_bounded(jobs, run_one, workers):
+    """Awaits run_one(job) for every job with `workers` tasks pulling from one shared iterator."""
+    jobs = iter(jobs)
+
+    async def worker():
+        for job in jobs: # next() never awaits, so the workers cannot interleave inside the generator
+            await run_one(job)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+
+def new_session():
+    """aiohttp session with the same keep-alive pool size and timeout as the sync client."""
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=HTTP_POOL_SIZE),
+                                 timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+
+async def main():
+    director = AsyncVulcanDirector(SERVER_ADDRESS, CLIENT_ID,
+                                   metrics=MetricsSink() if METRICS_LOG or METRICS_PROM or METRICS_PORT else None)
+    await director.connect()
+
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
+        workflow_dag = json.load(f)
+
+    try:
+        await director.run_batch(schedule(build_jobs(workflow_dag, load_scenarios())), concurrency=max(1, PIPELINE_DEPTH))
+    finally:
+        await director.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
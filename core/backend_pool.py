@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import aiohttp
+
+from director import SERVER_ADDRESS, OUTPUT_FOLDER, CLIENT_ID, PIPELINE_DEPTH, WORKFLOW_FILE, build_jobs
+from async_director import AsyncVulcanDirector, new_session, run_bounded
+from job_metrics import METRICS_LOG, METRICS_PROM, METRICS_PORT, JobMetrics, MetricsSink
+from scheduler import schedule
+from scenario_catalog import load_scenarios
+
+# Comma-separated list of ComfyUI hosts, e.g. "192.168.1.10:8188,192.168.1.11:8188"
+SERVER_POOL = [s.strip() for s in os.getenv("COMFYUI_SERVERS", SERVER_ADDRESS).split(",") if s.strip()]
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "5"))  # seconds between /queue probes
+HEALTH_FAILURES = int(os.getenv("HEALTH_FAILURES", "2"))    # consecutive failed probes before eviction
+MAX_RESUBMITS = 3
+
+class Backend:
+    """One ComfyUI server in the pool and what we know about its load."""
+
+    def __init__(self, address, client_id, output_folder):
+        self.address = address
+        self.director = AsyncVulcanDirector(address, client_id, output_folder)
+        self.alive = False
+        self.failures = 0
+        self.queue_depth = 0          # running + pending, as of the last /queue probe
+        self.dispatched_since_probe = 0
+        self.in_flight = 0            # our jobs currently submitted to this server
+
+    @property
+    def load(self):
+        return self.queue_depth + self.dispatched_since_probe
+
+class BackendPool:
+    """Spreads jobs over several ComfyUI servers, always feeding the one with the shortest queue."""
+
+    def __init__(self, addresses, client_id=CLIENT_ID, output_folder=OUTPUT_FOLDER, per_backend=PIPELINE_DEPTH, metrics=None):
+        self.backends = [Backend(a, client_id, output_folder) for a in addresses]
+        self.per_backend = max(1, per_backend)
+        self.metrics = metrics # Optional MetricsSink receiving one JobMetrics per finished job
+        self._changed = asyncio.Condition()
+        self._health = None
+
+    async def start(self):
+        await asyncio.gather(*(self._probe(b) for b in self.backends))
+        alive = [b.address for b in self.backends if b.alive]
+        print(f"🛰️ Pool ready: {len(alive)}/{len(self.backends)} engines online {alive}")
+        self._health = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health: self._health.cancel()
+        await asyncio.gather(*(b.director.close() for b in self.backends), return_exceptions=True)
+
+    # --- HEALTH CHECKS ---
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            await asyncio.gather(*(self._probe(b) for b in self.backends))
+
+    async def _probe(self, backend):
+        director = backend.director
+        if director.session is None:
+            director.session = new_session()
+        try:
+            async with director.session.get(f"http://{backend.address}/queue",
+                                            timeout=aiohttp.ClientTimeout(total=3)) as resp:
+                queue = await resp.json()
+            if not backend.alive:
+                await director.cancel_abandoned() # Prompts resubmitted elsewhere must not render twice
+                await director.connect() # (Re)open the event socket before taking jobs
+                backend.alive = True
+                print(f"✅ Engine online: {backend.address}")
+            backend.failures = 0
+            backend.queue_depth = len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+            backend.dispatched_since_probe = 0
+        except Exception as e:
+            backend.failures += 1
+            if backend.alive and backend.failures >= HEALTH_FAILURES:
+                self._evict(backend, e)
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _evict(self, backend, reason):
+        """Takes a node out of rotation; its in-flight jobs fail over and get resubmitted elsewhere."""
+        if not backend.alive:
+            return
+        print(f"❌ Engine offline, removing from rotation: {backend.address} ({reason})")
+        backend.alive = False
+        backend.director.abandon()
+
+    # --- DISPATCH ---
+    def _pick(self):
+        candidates = [b for b in self.backends if b.alive and b.in_flight < self.per_backend]
+        return min(candidates, key=lambda b: (b.load, b.in_flight), default=None)
+
+    async def _acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(self._pick)
+            backend = self._pick()
+            backend.in_flight += 1
+            backend.dispatched_since_probe += 1
+            return backend
+
+    async def _release(self, backend):
+        backend.in_flight -= 1
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def run_job(self, job):
+        metrics = JobMetrics(job['name'], job['index'], job['workflow'])
+        try:
+            saved = await self._run_attempts(job, metrics)
+        except Exception as e:
+            print(f"\n⚠️ Generation failed for {job['name']}: {e}")
+            saved = False
+        metrics.finish("ok" if saved else "failed")
+        if self.metrics:
+            self.metrics.record(metrics)
+
+    async def _run_attempts(self, job, metrics):
+        for attempt in range(MAX_RESUBMITS + 1):
+            backend = await self._acquire()
+            outputs = None
+            try:
+                outputs = await backend.director.get_images(job['workflow'], job['name'], metrics)
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500:
+                    # /prompt rejected the workflow (HTTP 4xx); every engine would reject it the same way
+                    print(f"\n⚠️ Generation failed for {job['name']}: HTTP {e.status} {e.message}")
+                    return False
+                # A 5xx is the engine's own trouble: retry elsewhere, the health probe decides on eviction
+            except RuntimeError as e:
+                # The workflow itself failed; another GPU would fail the same way
+                print(f"\n⚠️ Generation failed for {job['name']}: {e}")
+                return False
+            except (ConnectionError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self._evict(backend, e) # Transport failure: the engine itself is unreachable
+            except aiohttp.ClientError:
+                pass # e.g. a truncated response: retry elsewhere without evicting
+            finally:
+                await self._release(backend)
+            if outputs is not None:
+                return await backend.director.save_output(outputs, job['name'], job['index'], job.get('variants'), metrics)
+
+            await self._cancel_abandoned(backend)
+            if attempt == MAX_RESUBMITS:
+                break
+            print(f"🔁 Resubmitting {job['name']} (attempt {attempt+1}/{MAX_RESUBMITS})")
+            metrics.resubmitted()
+        print(f"❌ Giving up on {job['name']} after {MAX_RESUBMITS} resubmissions.")
+        return False
+
+    async def _cancel_abandoned(self, backend):
+        """Best effort: an unreachable engine keeps its list and is cleaned up when it comes back."""
+        try:
+            await backend.director.cancel_abandoned()
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            pass
+
+    async def run_batch(self, jobs):
+        # Enough workers to fill every engine's slots and overlap saving, but never one task per job
+        await run_bounded(jobs, self.run_job, 2 * len(self.backends) * self.per_backend)
+
+async def main():
+    pool = BackendPool(SERVER_POOL, metrics=MetricsSink() if METRICS_LOG or METRICS_PROM or METRICS_PORT else None)
+    await pool.start()
+
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
+        workflow_dag = json.load(f)
+
+    try:
+        await pool.run_batch(schedule(build_jobs(workflow_dag, load_scenarios())))
+    finally:
+        await pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
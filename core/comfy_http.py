@@ -0,0 +1,112 @@
+import http.client
+import json
+import os
+import queue
+import threading
+import urllib.error
+
+# Persistent connections kept per host, and the default socket timeout (seconds)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+# Downloads are copied to disk in pieces of this size instead of being held whole in memory
+DOWNLOAD_CHUNK = 256 * 1024
+
+# A reused keep-alive socket may have been closed by the server in the meantime
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                 ConnectionAbortedError, BrokenPipeError)
+
+class ComfyHTTP:
+    """Keep-alive HTTP client: a small pool of persistent connections per host, shared by every REST call."""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pools = {} # host -> LifoQueue of idle HTTPConnection
+        self._lock = threading.Lock()
+
+    def _pool(self, host):
+        with self._lock:
+            return self._pools.setdefault(host, queue.LifoQueue(self.pool_size))
+
+    def _checkout(self, host):
+        try:
+            return self._pool(host).get_nowait(), True
+        except queue.Empty:
+            return http.client.HTTPConnection(host, timeout=self.timeout), False
+
+    def _checkin(self, host, conn):
+        try:
+            self._pool(host).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, host, path, body=None, headers=None, timeout=None, sink=None):
+        """Returns the response body; raises urllib.error.HTTPError on 4xx/5xx like urlopen did.
+
+        With a `sink` (a writable file) the body is streamed into it in chunks and its size is returned.
+        """
+        for attempt in range(2):
+            conn, reused = self._checkout(host)
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                if sink is None or resp.status >= 400:
+                    data = resp.read()
+                else:
+                    data = 0
+                    while chunk := resp.read(DOWNLOAD_CHUNK):
+                        sink.write(chunk)
+                        data += len(chunk)
+            except _STALE_ERRORS:
+                conn.close()
+                if reused and attempt == 0 and (sink is None or sink.tell() == 0):
+                    continue # Retry once on a fresh socket (unless part of a body was already written)
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(host, conn)
+            if resp.status >= 400:
+                raise urllib.error.HTTPError(f"http://{host}{path}", resp.status, resp.reason, resp.headers, None)
+            return data
+
+    def get_bytes(self, host, path, timeout=None):
+        return self.request("GET", host, path, timeout=timeout)
+
+    def download(self, host, path, dest, timeout=None):
+        """Streams a GET response into `dest` via a .part file, so a failed transfer never leaves a truncated image."""
+        part = f"{dest}.part"
+        try:
+            with open(part, "wb") as f:
+                size = self.request("GET", host, path, timeout=timeout, sink=f)
+            os.replace(part, dest)
+            return size
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+    def get_json(self, host, path, timeout=None):
+        return json.loads(self.request("GET", host, path, timeout=timeout))
+
+    def post_json(self, host, path, payload, timeout=None):
+        body = json.dumps(payload).encode('utf-8')
+        data = self.request("POST", host, path, body=body,
+                            headers={"Content-Type": "application/json"}, timeout=timeout)
+        return json.loads(data) if data else {}
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+# One client per process so every director call reuses the same sockets
+HTTP = ComfyHTTP()
@@ -0,0 +1,17 @@
+import struct
+
+# ComfyUI binary WebSocket frames: 4-byte event type, 4-byte image format, then the encoded image
+PREVIEW_IMAGE = 1
+IMAGE_FORMATS = {1: "jpeg", 2: "png"}
+
+# Output node that pushes finished images over the socket instead of writing them to disk
+WS_SAVE_NODE = "SaveImageWebsocket"
+
+def ws_output_nodes(workflow):
+    """Ids of the nodes whose images arrive as binary frames instead of via /history."""
+    return {node_id for node_id, node in workflow.items() if node.get('class_type') == WS_SAVE_NODE}
+
+def decode_frame(frame):
+    """Splits a binary frame into (event_type, image_format, image_bytes)."""
+    event_type, image_format = struct.unpack(">II", frame[:8])
+    return event_type, IMAGE_FORMATS.get(image_format, "png"), frame[8:]
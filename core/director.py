@@ -1,23 +1,47 @@
 import websocket
 import uuid
 import json
-import urllib.request
 import urllib.parse
+import urllib.error
+import http.client
 import random
 import os
+import time
+import copy
+import shutil
+from contextlib import nullcontext
 from tqdm import tqdm # Professional Progress Tracking
 from dotenv import load_dotenv
+from comfy_ws import PREVIEW_IMAGE, ws_output_nodes, decode_frame
+from comfy_http import HTTP
+from render_cache import RENDER_CACHE, SEED_MODE, RenderCache, workflow_key, deterministic_seed
+from seed_sweep import sweep_jobs
+from scheduler import SCHEDULE, schedule, apply_overrides, load_workflow
+from job_metrics import METRICS_LOG, METRICS_PROM, METRICS_PORT, JobMetrics, MetricsSink
+from output_pipeline import OutputPipeline
+from scenario_catalog import SCENARIO_CATALOG, SCENARIO_IDS, SCENARIO_SHARD, load_scenarios
+from job_journal import JOURNAL_FILE, PENDING, SUBMITTED, RENDERED, SAVED, FAILED, JobJournal, batch_scope
 
 load_dotenv()
 
 SERVER_ADDRESS = os.getenv("COMFYUI_SERVER", "localhost:8188")
 OUTPUT_FOLDER = os.getenv("OUTPUT_DIR", "final_showcase")
 CLIENT_ID = str(uuid.uuid4())
+# How many prompts to keep queued on the server ahead of the one being saved
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "2"))
+# Use workflows/flux_ws_workflow.json to stream finished images over the WebSocket
+WORKFLOW_FILE = os.getenv("WORKFLOW_FILE", "workflows/flux_api_workflow.json")
 
 class VulcanDirector:
-    def __init__(self, server_address, client_id):
+    def __init__(self, server_address, client_id, output_folder=OUTPUT_FOLDER, http=HTTP, cache=None, metrics=None, journal=None, output=None):
         self.server_address = server_address
         self.client_id = client_id
+        self.output_folder = output_folder
+        self.http = http # Keep-alive connection pool shared by every REST call
+        self.cache = cache # Optional RenderCache: identical workflows never reach the server twice
+        self.metrics = metrics # Optional MetricsSink receiving one JobMetrics per finished job
+        self.journal = journal # Optional JobJournal: a restarted run picks up where the last one died
+        self.output = output or OutputPipeline() # Downloads, encodes and writes off the submit/receive loop
         self.ws = websocket.WebSocket()
 
     def connect(self):
@@ -31,9 +55,7 @@ class VulcanDirector:
 
     def queue_prompt(self, prompt_workflow):
         p = {"prompt": prompt_workflow, "client_id": self.client_id}
-        data = json.dumps(p).encode('utf-8')
-        req = urllib.request.Request(f"http://{self.server_address}/prompt", data=data)
-        return json.loads(urllib.request.urlopen(req).read())
+        return self.http.post_json(self.server_address, "/prompt", p)
 
     def get_images(self, workflow, scene_name):
         prompt_id = self.queue_prompt(workflow)['prompt_id']
@@ -60,63 +82,352 @@ class VulcanDirector:
             else:
                 continue
 
-        with urllib.request.urlopen(f"http://{self.server_address}/history/{prompt_id}") as response:
-            return json.loads(response.read())[prompt_id]['outputs']
+        return self.get_history(prompt_id)[prompt_id]['outputs']
 
-    def save_output(self, node_outputs, scene_name, index):
-        """Resilient saving logic to handle post-generation I/O lag."""
-        if not os.path.exists(OUTPUT_FOLDER): os.makedirs(OUTPUT_FOLDER)
-        
+    def get_history(self, prompt_id):
+        return self.http.get_json(self.server_address, f"/history/{prompt_id}")
+
+    def run_pipelined(self, jobs, depth=PIPELINE_DEPTH):
+        """Keeps `depth` prompts queued on the server and saves each render as it finishes."""
+        jobs = iter(jobs)
+        retry = [] # jobs whose streamed images were lost and must be rendered again
+        in_flight = {} # prompt_id -> job
+        streamed = {} # prompt_id -> {node_id: [image bytes]} for SaveImageWebsocket outputs
+        executing = {"prompt_id": None, "node": None} # binary frames carry no prompt_id
+        bars = {}
+
+        def next_job():
+            for job in jobs:
+                if not self.journal:
+                    return job
+                state, job = self.journal.track(job)
+                if state in (PENDING, FAILED): # Saved ones are done; in-flight ones were settled by resume()
+                    return job
+            return None
+
+        def watch(prompt_id, job):
+            in_flight[prompt_id] = job
+            nodes = ws_output_nodes(job['workflow'])
+            if nodes:
+                streamed[prompt_id] = {node_id: [] for node_id in nodes}
+
+        def submit_next():
+            job = retry.pop() if retry else next_job()
+            while job is not None:
+                if self.cache and self.serve_from_cache(job):
+                    job = next_job()
+                    continue
+                job['metrics'] = JobMetrics(job['name'], job['index'], job['workflow'])
+                try:
+                    prompt_id = self.queue_prompt(job['workflow'])['prompt_id']
+                except urllib.error.HTTPError as e:
+                    # /prompt rejected this scenario (e.g. a typo in an override); the rest of the batch goes on
+                    self.fail(job, f"HTTP {e.code} {e.reason}")
+                    job = next_job()
+                    continue
+                except (OSError, http.client.HTTPException) as e:
+                    self.fail(job, e)
+                    job = next_job()
+                    continue
+                job['metrics'].submitted(prompt_id)
+                if self.journal: self.journal.mark(job, SUBMITTED, prompt_id)
+                watch(prompt_id, job)
+                return True
+            return False
+
+        def finish(prompt_id, outputs=None):
+            job = in_flight.pop(prompt_id)
+            frames = streamed.pop(prompt_id, None)
+            if prompt_id in bars: bars.pop(prompt_id).close()
+            # Refill the queue, then hand the slow history/download/write path to the output workers
+            while len(in_flight) < depth and submit_next():
+                pass
+            self.output.submit(self.collect, prompt_id, job, frames, outputs)
+
+        if self.journal:
+            done = self.resume(watch, retry)
+            for prompt_id, job, outputs in done:
+                in_flight[prompt_id] = job
+                finish(prompt_id, outputs)
+
+        while len(in_flight) < depth and submit_next():
+            pass
+
+        while in_flight:
+            try:
+                out = self.ws.recv()
+            except Exception as e:
+                # Reconnect if the peer reset the connection, then collect anything that finished meanwhile
+                if "104" not in str(e):
+                    raise
+                print(f"\n⚠️ Engine connection lost: {e}")
+                print("🔄 Attempting to reconnect to Engine...")
+                self.ws = websocket.WebSocket()
+                self.connect()
+                for prompt_id in list(in_flight):
+                    if prompt_id not in self.get_history(prompt_id):
+                        continue
+                    if prompt_id in streamed:
+                        # Its images went out over the dead socket; render it again
+                        retry.append(in_flight.pop(prompt_id))
+                        streamed.pop(prompt_id)
+                        submit_next()
+                    else:
+                        finish(prompt_id)
+                continue
+
+            if not isinstance(out, str):
+                # STREAMED OUTPUT: frames emitted while a SaveImageWebsocket node runs are final images
+                frames = streamed.get(executing['prompt_id'], {}).get(executing['node'])
+                if frames is not None:
+                    event_type, image_format, image = decode_frame(out)
+                    if event_type == PREVIEW_IMAGE:
+                        frames.append(image)
+                continue
+            message = json.loads(out)
+            data = message.get('data', {})
+            prompt_id = data.get('prompt_id')
+            if message['type'] == 'executing':
+                executing.update(prompt_id=prompt_id, node=data.get('node'))
+            if prompt_id not in in_flight:
+                continue
+            in_flight[prompt_id]['metrics'].on_event(message)
+
+            if message['type'] == 'progress':
+                if prompt_id not in bars:
+                    bars[prompt_id] = tqdm(total=data['max'], desc=f"🎨 Rendering {in_flight[prompt_id]['name']}", unit="step")
+                bars[prompt_id].n = data['value']
+                bars[prompt_id].refresh()
+
+            elif message['type'] == 'execution_error':
+                job = in_flight.pop(prompt_id)
+                streamed.pop(prompt_id, None)
+                if prompt_id in bars: bars.pop(prompt_id).close()
+                self.fail(job, data.get('exception_message'))
+                while len(in_flight) < depth and submit_next():
+                    pass
+
+            elif message['type'] == 'executing' and data['node'] is None:
+                finish(prompt_id)
+
+        self.output.drain()
+        if self.journal and self.journal.finish_batch():
+            print(f"📒 Batch complete: {self.journal.counts()}")
+
+    def resume(self, watch, retry):
+        """Reconciles jobs a previous run left between submission and save with /history and /queue.
+
+        Finished prompts are returned as [(prompt_id, job, outputs)] for saving, prompts still
+        queued are handed to `watch`, and prompts the server lost (e.g. it restarted) go to `retry`.
+        """
+        unfinished = self.journal.unfinished()
+        if not unfinished:
+            return []
+        queue = self.http.get_json(self.server_address, "/queue")
+        queued = {entry[1] for entry in queue.get('queue_running', []) + queue.get('queue_pending', [])}
+
+        done = []
+        for state, job, prompt_id, outputs in unfinished:
+            job['metrics'] = JobMetrics(job['name'], job['index'], job['workflow'])
+            job['metrics'].submitted(prompt_id)
+            if self.cache:
+                job['cache_key'] = workflow_key(job['workflow'])
+            streams = bool(ws_output_nodes(job['workflow']))
+
+            if state == RENDERED:
+                done.append((prompt_id, job, outputs))
+            elif prompt_id in queued:
+                print(f"⏳ Still queued from last run: {job['name']}")
+                watch(prompt_id, job)
+            else:
+                history = self.get_history(prompt_id) # Checked after /queue: a job finishing in between is not lost
+                if prompt_id in history and not streams:
+                    print(f"📥 Finished while we were away: {job['name']}")
+                    done.append((prompt_id, job, history[prompt_id]['outputs']))
+                else:
+                    # Lost by the server, or its streamed images went to a dead socket
+                    print(f"🔁 Resubmitting {job['name']}")
+                    retry.insert(0, job) # retry is popped from the end; keep the scenario order
+        return done
+
+    def collect(self, prompt_id, job, frames=None, outputs=None):
+        """Output-worker side of a finished job: history, download, write, cache, journal and metrics."""
+        metrics = job['metrics']
+        try:
+            if frames is not None:
+                outputs = {node_id: {"image_bytes": images} for node_id, images in frames.items()}
+            elif outputs is None:
+                with metrics.phase('history'):
+                    outputs = self.get_history(prompt_id)[prompt_id]['outputs']
+                if self.journal: self.journal.mark(job, RENDERED, outputs=outputs)
+            saved = self.save_output(outputs, job['name'], job['index'], job.get('variants'), metrics, job['workflow'])
+            if self.cache and len(saved) == len(job.get('variants') or [None]):
+                # A sweep with a failed download is never cached: the gaps would shift images onto the wrong seeds
+                self.cache.put(job['cache_key'], saved)
+            if self.journal: self.journal.mark(job, SAVED if saved else FAILED)
+            self.record(metrics.finish("ok" if saved else "failed"))
+        except Exception as e:
+            # Left as rendered in the journal: the next run downloads it again
+            print(f"⚠️ Saving {job['name']} failed: {e}")
+            self.record(metrics.finish("failed"))
+
+    def fail(self, job, reason):
+        print(f"\n⚠️ Generation failed for {job['name']}: {reason}")
+        if self.journal: self.journal.mark(job, FAILED)
+        self.record(job['metrics'].finish("failed"))
+
+    def record(self, job_metrics):
+        if self.metrics:
+            self.metrics.record(job_metrics)
+
+    def serve_from_cache(self, job):
+        """Cache-hit path: a previous identical render is copied into place by an output worker, never by the server."""
+        job['cache_key'] = workflow_key(job['workflow'])
+        cached = self.cache.get(job['cache_key'])
+        if not cached or len(cached) != len(job.get('variants') or [None]):
+            return False # Missing, or an incomplete entry from before partial sweeps were refused: render again
+        self.output.submit(self.copy_cached, job, cached)
+        return True
+
+    def copy_cached(self, job, cached):
+        os.makedirs(self.output_folder, exist_ok=True)
+        variants = job.get('variants') or [None]
+        try:
+            for path, variant in zip(cached, variants):
+                filename = output_path(self.output_folder, job['name'], job['index'], variant)
+                shutil.copyfile(path, filename)
+                if variant:
+                    write_sidecar(filename, variant)
+                self.output.finalize(filename, job['workflow'], variant)
+                print(f"♻️ Cache hit: {filename}")
+            if self.journal: self.journal.mark(job, SAVED)
+        except OSError as e:
+            # Still pending in the journal: the next run renders it
+            print(f"⚠️ Copying cached {job['name']} failed: {e}")
+
+    def fetch_image(self, img, scene_name, dest):
+        """Streams one image from /view straight into `dest`; True on success."""
+        params = urllib.parse.urlencode({
+            "filename": img['filename'], 
+            "subfolder": img['subfolder'], 
+            "type": img['type']
+        })
+
+        # RETRY LOGIC: Attempt to download 3 times if the GPU is lagging (only this output worker waits)
+        for attempt in range(3):
+            try:
+                self.http.download(self.server_address, f"/view?{params}", dest, timeout=30)
+                return True
+            except Exception as e:
+                print(f"⚠️ Retrieval Attempt {attempt+1} failed: {e}. Retrying...")
+                time.sleep(5) # Wait for Windows I/O to stabilize
+
+        print(f"❌ Failed to retrieve {scene_name} after 3 attempts.")
+        return False
+
+    def save_output(self, node_outputs, scene_name, index, variants=None, metrics=None, workflow=None):
+        """Resilient saving logic to handle post-generation I/O lag. Returns the saved paths.
+
+        Without `variants` only the first image is kept; a sweep keeps one image per variant.
+        Streamed images are already in memory; downloads go to disk chunk by chunk.
+        """
+        timed = metrics.phase if metrics else lambda name: nullcontext()
+        images = []
+        downloads = []
         for node_id, output in node_outputs.items():
-            if 'images' in output:
-                for img in output['images']:
-                    params = urllib.parse.urlencode({
-                        "filename": img['filename'], 
-                        "subfolder": img['subfolder'], 
-                        "type": img['type']
-                    })
-                    
-                    # RETRY LOGIC: Attempt to download 3 times if the GPU is lagging
-                    for attempt in range(3):
-                        try:
-                            url = f"http://{self.server_address}/view?{params}"
-                            with urllib.request.urlopen(url, timeout=30) as resp:
-                                filename = f"{OUTPUT_FOLDER}/{str(index).zfill(2)}_{scene_name}.png"
-                                with open(filename, "wb") as f:
-                                    f.write(resp.read())
-                                print(f"✅ Successfully Retrieved: {filename}")
-                                return # Success, exit retry loop
-                        except Exception as e:
-                            print(f"⚠️ Retrieval Attempt {attempt+1} failed: {e}. Retrying...")
-                            time.sleep(5) # Wait for Windows I/O to stabilize
-                    
-                    print(f"❌ Failed to retrieve {scene_name} after 3 attempts.")
-
-# --- SCENARIOS (Ensure these names match your previous setup) ---
-SCENARIOS = [
-    {"name": "Corporate_CEO", "prompt": "Caitlyn as a tech CEO giving a keynote speech, modern auditorium, confident smile."},
-    {"name": "Coffee_Ad", "prompt": "Caitlyn holding a steaming ceramic coffee cup, cozy sweater, rainy cafe window."}
-]
+            # STREAMED: images that already arrived over the WebSocket need no download
+            images.extend(output.get('image_bytes', []))
+            downloads.extend(output.get('images', []))
+
+        with timed('write'):
+            saved = list(zip(write_images(self.output_folder, images, scene_name, index, variants), variants or [None]))
+        slots = (variants or [None])[len(images):] # A sweep's images stay matched to their seeds by position
+        os.makedirs(self.output_folder, exist_ok=True)
+        for img, variant in zip(downloads, slots):
+            filename = output_path(self.output_folder, scene_name, index, variant)
+            with timed('download'):
+                ok = self.fetch_image(img, scene_name, filename)
+            if ok:
+                if variant:
+                    write_sidecar(filename, variant)
+                saved.append((filename, variant))
+
+        if workflow is not None:
+            with timed('encode'):
+                for filename, variant in saved:
+                    self.output.finalize(filename, workflow, variant, metrics)
+        saved = [filename for filename, _ in saved]
+        for filename in saved:
+            print(f"✅ Successfully Retrieved: {filename}")
+        return saved
+
+def output_path(output_folder, scene_name, index, variant=None):
+    suffix = f"_v{str(variant['variant']).zfill(2)}" if variant else ""
+    return f"{output_folder}/{str(index).zfill(2)}_{scene_name}{suffix}.png"
+
+def write_images(output_folder, images, scene_name, index, variants=None):
+    """Writes rendered images; sweep variants also get a JSON sidecar recording their seed."""
+    os.makedirs(output_folder, exist_ok=True)
+    if variants is None:
+        images, variants = images[:1], [None]
+
+    saved = []
+    for variant, image in zip(variants, images):
+        if image is None:
+            continue
+        filename = output_path(output_folder, scene_name, index, variant)
+        with open(filename, "wb") as f:
+            f.write(image)
+        if variant:
+            write_sidecar(filename, variant)
+        saved.append(filename)
+    return saved
+
+def write_sidecar(filename, record):
+    with open(filename[:-len(".png")] + ".json", "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+
+# --- SCENARIOS: read from SCENARIO_CATALOG (scenarios/showcase.jsonl), shared with the board tools ---
+
+def build_jobs(workflow_dag, scenarios):
+    """Yields one self-contained job (its own workflow copy) per scenario.
+
+    A scenario may name its own `workflow` file and override unet, lora, strengths, resolution,
+    steps, negative prompt and seed. Its `id` becomes the output prefix (01_Name.png).
+    """
+    for i, scene in enumerate(scenarios):
+        base = load_workflow(scene['workflow']) if 'workflow' in scene else workflow_dag
+        workflow = apply_overrides(copy.deepcopy(base), scene)
+        workflow["6"]["inputs"]["text"] = scene['prompt']
+        if 'seed' in scene:
+            workflow["3"]["inputs"]["seed"] = scene['seed']
+        elif SEED_MODE == "deterministic":
+            workflow["3"]["inputs"]["seed"] = deterministic_seed(scene)
+        else:
+            workflow["3"]["inputs"]["seed"] = random.randint(1, 10**12)
+        job = {"name": scene['name'], "index": scene.get('id', i + 1), "workflow": workflow}
+        # SEED SWEEP: {"variants": N} renders N seeds of one prompt in batched latents
+        if scene.get('variants', 1) > 1:
+            yield from sweep_jobs(job, scene['variants'])
+        else:
+            yield job
 
 if __name__ == "__main__":
-    director = VulcanDirector(SERVER_ADDRESS, CLIENT_ID)
+    journal = JobJournal() if JOURNAL_FILE else None
+    # A resumed batch reconnects with its old client id so ComfyUI still routes its prompts' events to us
+    scope = batch_scope(SCENARIO_CATALOG, SCENARIO_IDS, SCENARIO_SHARD, WORKFLOW_FILE)
+    client_id = journal.open_batch(CLIENT_ID, scope) if journal else CLIENT_ID
+    if journal and journal.resumed:
+        print(f"📒 Resuming unfinished batch from {JOURNAL_FILE}: {journal.counts()}")
+    director = VulcanDirector(SERVER_ADDRESS, client_id, cache=RenderCache() if RENDER_CACHE else None,
+                              metrics=MetricsSink() if METRICS_LOG or METRICS_PROM or METRICS_PORT else None,
+                              journal=journal)
     director.connect()
 
-    with open("workflows/flux_api_workflow.json", "r", encoding="utf-8") as f:
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
         workflow_dag = json.load(f)
 
-    for i, scene in enumerate(SCENARIOS):
-        workflow_dag["6"]["inputs"]["text"] = scene['prompt']
-        workflow_dag["3"]["inputs"]["seed"] = random.randint(1, 10**12)
-
-        try:
-            # Pass scene_name to the progress bar handler
-            outputs = director.get_images(workflow_dag, scene['name'])
-            director.save_output(outputs, scene['name'], i + 1)
-        except Exception as e:
-            print(f"\n⚠️ Generation failed: {e}")
-            # Reconnect if the peer reset the connection
-            if "104" in str(e):
-                print("🔄 Attempting to reconnect to Engine...")
-                director.connect()
-            continue
\ No newline at end of file
+    # PIPELINE_DEPTH=1 reproduces the old one-at-a-time behaviour
+    print(f"🚚 Pipelining {SCENARIO_CATALOG} with {PIPELINE_DEPTH} queued ahead ({SCHEDULE} order)")
+    director.run_pipelined(schedule(build_jobs(workflow_dag, load_scenarios())), depth=max(1, PIPELINE_DEPTH))
+    director.output.close()
\ No newline at end of file
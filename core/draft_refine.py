@@ -0,0 +1,123 @@
+import argparse
+import copy
+import json
+import os
+from dotenv import load_dotenv
+from director import (SERVER_ADDRESS, OUTPUT_FOLDER, CLIENT_ID, PIPELINE_DEPTH, WORKFLOW_FILE,
+                      VulcanDirector, build_jobs, output_path)
+from scenario_catalog import load_scenarios
+from render_cache import RENDER_CACHE, RenderCache
+from seed_sweep import isolate_variant
+from scheduler import schedule
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+DRAFT_DIR = os.getenv("DRAFT_DIR", os.path.join(OUTPUT_FOLDER, "drafts"))
+DRAFT_STEPS = int(os.getenv("DRAFT_STEPS", "8"))
+# 1.0 keeps the full resolution: the latent noise depends on its size, so a smaller draft is a different picture
+DRAFT_SCALE = float(os.getenv("DRAFT_SCALE", "1.0"))
+CONTACT_THUMB = int(os.getenv("CONTACT_THUMB", "256"))
+
+MANIFEST = "manifest.json"
+
+def draft_workflow(workflow, steps=DRAFT_STEPS, scale=DRAFT_SCALE):
+    """Cheap version of a workflow: same seed and prompt, fewer sampler steps, optionally a smaller latent."""
+    draft = copy.deepcopy(workflow)
+    for node in draft.values():
+        if node['class_type'] == "KSampler":
+            node['inputs']['steps'] = min(steps, node['inputs']['steps'])
+        elif node['class_type'] == "EmptyLatentImage" and scale != 1.0:
+            for side in ("width", "height"):
+                node['inputs'][side] = max(64, int(node['inputs'][side] * scale) // 64 * 64)
+    return draft
+
+def draft_stage(workflow_dag, scenarios, draft_dir=DRAFT_DIR):
+    """Renders every scenario and seed as a draft, then writes the manifest and a contact sheet."""
+    jobs = list(build_jobs(workflow_dag, scenarios))
+    entries = []
+    for job in jobs:
+        for variant in job.get('variants') or [None]:
+            entries.append({"file": os.path.basename(output_path(draft_dir, job['name'], job['index'], variant)),
+                            "name": job['name'], "index": job['index'], "variant": variant,
+                            "workflow": job['workflow']}) # Full-quality workflow, replayed by refine
+
+    director = VulcanDirector(SERVER_ADDRESS, CLIENT_ID, output_folder=draft_dir)
+    director.connect()
+    print(f"✏️ Drafting {len(entries)} images at {DRAFT_STEPS} steps, scale {DRAFT_SCALE}")
+    director.run_pipelined(schedule({**job, "workflow": draft_workflow(job['workflow'])} for job in jobs),
+                           depth=max(1, PIPELINE_DEPTH))
+    director.output.close()
+
+    with open(os.path.join(draft_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    sheet = contact_sheet([e for e in entries if os.path.exists(os.path.join(draft_dir, e['file']))], draft_dir)
+    print(f"🗂️ Contact sheet: {sheet}")
+    print("👉 Pick with: python core/draft_refine.py refine <file> ... (or delete rejects and use --kept)")
+
+def contact_sheet(entries, draft_dir, thumb=CONTACT_THUMB, columns=None):
+    """One labelled grid of every draft, so picking seeds is a single glance."""
+    from PIL import Image, ImageDraw # Only needed for the sheet
+    columns = columns or max(1, min(6, round(len(entries) ** 0.5 + 0.5)))
+    label = 18
+    rows = max(1, -(-len(entries) // columns))
+    sheet = Image.new("RGB", (columns * thumb, rows * (thumb + label)), "white")
+    draw = ImageDraw.Draw(sheet)
+    for i, entry in enumerate(entries):
+        x, y = (i % columns) * thumb, (i // columns) * (thumb + label)
+        with Image.open(os.path.join(draft_dir, entry['file'])) as img:
+            img = img.convert("RGB")
+            img.thumbnail((thumb, thumb))
+            sheet.paste(img, (x + (thumb - img.width) // 2, y + (thumb - img.height) // 2))
+        draw.text((x + 4, y + thumb + 3), os.path.splitext(entry['file'])[0], fill="black")
+    path = os.path.join(draft_dir, "contact_sheet.jpg")
+    sheet.save(path, quality=90)
+    return path
+
+def refine_jobs(entries):
+    """Full-quality jobs for the picked drafts; a sweep variant is isolated so it matches its draft seed for seed."""
+    for entry in entries:
+        variant = entry['variant']
+        if variant:
+            yield {"name": entry['name'], "index": entry['index'],
+                   "workflow": isolate_variant(entry['workflow'], variant), "variants": [variant]}
+        else:
+            yield {"name": entry['name'], "index": entry['index'], "workflow": entry['workflow']}
+
+def refine_stage(picks, kept=False, draft_dir=DRAFT_DIR, output_folder=OUTPUT_FOLDER):
+    with open(os.path.join(draft_dir, MANIFEST), "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if kept:
+        chosen = [e for e in entries if os.path.exists(os.path.join(draft_dir, e['file']))]
+    else:
+        stems = {os.path.splitext(os.path.basename(p))[0] for p in picks}
+        chosen = [e for e in entries if os.path.splitext(e['file'])[0] in stems]
+        missing = stems - {os.path.splitext(e['file'])[0] for e in chosen}
+        if missing:
+            print(f"⚠️ Not in the draft manifest: {', '.join(sorted(missing))}")
+    if not chosen:
+        print("❌ Nothing picked.")
+        return
+
+    director = VulcanDirector(SERVER_ADDRESS, CLIENT_ID, output_folder=output_folder,
+                              cache=RenderCache() if RENDER_CACHE else None)
+    director.connect()
+    print(f"💎 Refining {len(chosen)} of {len(entries)} drafts at full quality")
+    director.run_pipelined(schedule(refine_jobs(chosen)), depth=max(1, PIPELINE_DEPTH))
+    director.output.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draft every scenario cheaply, then re-render only the picks at full quality.")
+    sub = parser.add_subparsers(dest="stage", required=True)
+    sub.add_parser("draft", help="render drafts, a manifest and a contact sheet into DRAFT_DIR")
+    refine = sub.add_parser("refine", help="re-render picked drafts with the same seed at full quality")
+    refine.add_argument("picks", nargs="*", help="draft file names, e.g. 01_Corporate_CEO_v03.png")
+    refine.add_argument("--kept", action="store_true", help="refine every draft still in DRAFT_DIR (delete the rejects first)")
+    args = parser.parse_args()
+
+    if args.stage == "draft":
+        with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
+            workflow_dag = json.load(f)
+        draft_stage(workflow_dag, load_scenarios())
+    else:
+        refine_stage(args.picks, kept=args.kept)
@@ -1,67 +1,216 @@
 import websocket # pip install websocket-client
 import uuid
 import json
-import urllib.request
 import urllib.parse
 import random
 import os
 import sys
+import copy
+import queue
+import threading
+import time
+from comfy_ws import PREVIEW_IMAGE, ws_output_nodes, decode_frame
+from comfy_http import HTTP # Keep-alive pool: no TCP setup per call across the bridge
 
 # --- CONFIGURATION ---
 # Your Windows IP (Check if it changed!)
-SERVER_ADDRESS = "192.168.112.1:8188" 
+SERVER_ADDRESS = os.getenv("COMFYUI_SERVER", "192.168.112.1:8188")
 CLIENT_ID = str(uuid.uuid4())
+WORKFLOW_FILE = os.getenv("WORKFLOW_FILE", "workflows/flux_api_workflow.json")
+# Latest latent preview, overwritten in place while sampling (start ComfyUI with --preview-method auto)
+PREVIEW_FILE = os.getenv("INSTANT_PREVIEW", "instant_preview")
+EXIT_WORDS = ["exit", "quit", "q"]
 
 def queue_prompt(prompt):
     p = {"prompt": prompt, "client_id": CLIENT_ID}
-    data = json.dumps(p).encode('utf-8')
-    req = urllib.request.Request(f"http://{SERVER_ADDRESS}/prompt", data=data)
-    return json.loads(urllib.request.urlopen(req).read())
+    return HTTP.post_json(SERVER_ADDRESS, "/prompt", p)
 
 def get_image(filename, subfolder, folder_type):
     data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
     url_values = urllib.parse.urlencode(data)
-    with urllib.request.urlopen(f"http://{SERVER_ADDRESS}/view?{url_values}") as response:
-        return response.read()
+    return HTTP.get_bytes(SERVER_ADDRESS, f"/view?{url_values}")
 
 def get_history(prompt_id):
-    with urllib.request.urlopen(f"http://{SERVER_ADDRESS}/history/{prompt_id}") as response:
-        return json.loads(response.read())
-
-def get_images(ws, workflow):
-    prompt_id = queue_prompt(workflow)['prompt_id']
-    output_images = {}
-    while True:
-        out = ws.recv()
-        if isinstance(out, str):
-            message = json.loads(out)
-            if message['type'] == 'executing':
-                data = message['data']
-                if data['node'] is None and data['prompt_id'] == prompt_id:
-                    break # Execution is done
-        else:
-            continue
-
-    history = get_history(prompt_id)[prompt_id]
-    for node_id in history['outputs']:
-        node_output = history['outputs'][node_id]
-        if 'images' in node_output:
-            images_output = []
-            for image in node_output['images']:
-                image_data = get_image(image['filename'], image['subfolder'], image['type'])
-                images_output.append(image_data)
-            output_images[node_id] = images_output
-
-    return output_images
+    return HTTP.get_json(SERVER_ADDRESS, f"/history/{prompt_id}")
+
+def cancel(prompt_id, running):
+    """Drops a stale prompt: removed from the queue if still waiting, interrupted if already on the GPU."""
+    HTTP.post_json(SERVER_ADDRESS, "/queue", {"delete": [prompt_id]})
+    if running:
+        # Newer ComfyUI only interrupts the given prompt; older builds interrupt whatever is running
+        HTTP.post_json(SERVER_ADDRESS, "/interrupt", {"prompt_id": prompt_id})
+
+def save_images(images, user_input, open_file=True):
+    for node_id in images:
+        for image_data in images[node_id]:
+            # Create a clean filename from the first few words of the prompt
+            safe_name = "".join([c for c in user_input[:20] if c.isalnum() or c==' ']).strip().replace(" ", "_")
+            filename = f"instant_{safe_name}.png"
+
+            with open(filename, "wb") as f:
+                f.write(image_data)
+
+            print(f"✅ Saved: {filename}")
+
+            # MAGIC COMMAND: Open image in Windows
+            if open_file:
+                print("👀 Opening...")
+                os.system(f"explorer.exe {filename}")
+
+class InstantSession:
+    """Interactive loop where typing never waits on rendering.
+
+    Keyboard input and WebSocket frames are read on their own threads and handled in one place.
+    Latent previews are written to PREVIEW_FILE as they arrive. A new prompt cancels the one in
+    progress, so the GPU moves straight on to the latest idea.
+    """
+
+    def __init__(self, ws, workflow, save=save_images):
+        self.ws = ws
+        self.workflow = workflow
+        self.save = save         # save(images, prompt_text) once a render is downloaded
+        self.events = queue.Queue()
+        self.job = None          # The live prompt: {"prompt_id", "text", "started", "first_pixel", "streamed"}
+        self.cancelled = set()   # Stale prompt ids deleted while queued, interrupted if they still reach the GPU
+        self.executing = None    # (prompt_id, node) — binary frames carry no prompt_id
+
+    def start(self, read_input=True):
+        if read_input: # Without it, ("input", text) events can be put on self.events directly
+            threading.Thread(target=self._read_input, daemon=True).start()
+        threading.Thread(target=self._read_ws, daemon=True).start()
+        return self
+
+    def _read_input(self):
+        while True:
+            try:
+                line = input()
+            except EOFError:
+                line = EXIT_WORDS[0]
+            self.events.put(("input", line))
+            if line.strip().lower() in EXIT_WORDS:
+                return
+
+    def _read_ws(self):
+        while True:
+            try:
+                self.events.put(("ws", self.ws.recv()))
+            except Exception as e:
+                self.events.put(("lost", e))
+                return
+
+    def submit(self, text):
+        if self.job is not None:
+            stale = self.job['prompt_id']
+            running = self.executing is not None and self.executing[0] == stale
+            if not running:
+                self.cancelled.add(stale) # The delete may race the prompt onto the GPU
+            cancel(stale, running=running)
+            print(f"\n⏭️ Cancelled: {self.job['text'][:40]}")
+
+        workflow = copy.deepcopy(self.workflow)
+        workflow["6"]["inputs"]["text"] = text
+        workflow["3"]["inputs"]["seed"] = random.randint(1, 10**10)
+        prompt_id = queue_prompt(workflow)['prompt_id']
+        self.job = {"prompt_id": prompt_id, "text": text, "started": time.perf_counter(), "first_pixel": None,
+                    "streamed": {node_id: [] for node_id in ws_output_nodes(workflow)}}
+        print("⏳ Generating...")
+
+    def on_message(self, message):
+        data = message.get('data', {})
+        prompt_id = data.get('prompt_id')
+        if prompt_id in self.cancelled:
+            # The stale prompt left the queue before our delete landed: stop it on the GPU instead, once.
+            # Never on its closing event: by then the next prompt may hold the GPU, and builds that
+            # ignore prompt_id would interrupt that one instead
+            self.cancelled.discard(prompt_id)
+            if message['type'] == 'execution_start' or (message['type'] == 'executing' and data['node'] is not None):
+                cancel(prompt_id, running=True)
+        if message['type'] == 'executing':
+            self.executing = (prompt_id, data['node']) if data['node'] is not None else None
+
+        job = self.job
+        if job is None or prompt_id != job['prompt_id']:
+            return
+        if message['type'] == 'progress':
+            print(f"\r🎨 Step {data['value']}/{data['max']}", end="", flush=True)
+        elif message['type'] == 'execution_error':
+            print(f"\n⚠️ Error: {data.get('exception_message')}")
+            self.job = None
+        elif message['type'] == 'execution_interrupted':
+            print("\n⚠️ Interrupted on the server")
+            self.job = None
+        elif message['type'] == 'executing' and data['node'] is None:
+            print(f"\n🏁 Done in {time.perf_counter() - job['started']:.1f}s")
+            self.job = None
+            # Downloading and opening happen off the loop, so the next prompt can go out right away
+            threading.Thread(target=self.collect, args=(job,), daemon=True).start()
+
+    def on_frame(self, frame):
+        job = self.job
+        if job is None or self.executing is None or self.executing[0] != job['prompt_id']:
+            return
+        event_type, image_format, image = decode_frame(frame)
+        if event_type != PREVIEW_IMAGE:
+            return
+        node = self.executing[1]
+        if node in job['streamed']:
+            job['streamed'][node].append(image) # SaveImageWebsocket: the final image itself
+            return
+        path = f"{PREVIEW_FILE}.{'jpg' if image_format == 'jpeg' else 'png'}"
+        if job['first_pixel'] is None:
+            job['first_pixel'] = time.perf_counter() - job['started']
+            print(f"\r⚡ First preview after {job['first_pixel']:.2f}s -> {path}")
+        with open(path + ".tmp", "wb") as f:
+            f.write(image)
+        os.replace(path + ".tmp", path) # Viewers never read half a preview
+
+    def collect(self, job):
+        try:
+            if job['streamed']:
+                images = job['streamed']
+            else:
+                outputs = get_history(job['prompt_id'])[job['prompt_id']]['outputs']
+                images = {node_id: [get_image(i['filename'], i['subfolder'], i['type']) for i in out.get('images', [])]
+                          for node_id, out in outputs.items()}
+            self.save(images, job['text'])
+        except Exception as e:
+            print(f"⚠️ Error: {e}")
+
+    def run(self):
+        print("\n🎨 Enter Prompt (a new one replaces the render in progress): ")
+        while True:
+            kind, payload = self.events.get()
+            if kind == "lost":
+                print(f"❌ Connection Error: {payload}")
+                return
+            if kind == "ws":
+                if isinstance(payload, str):
+                    self.on_message(json.loads(payload))
+                else:
+                    self.on_frame(payload)
+                continue
+
+            user_input = payload.strip()
+            if user_input.lower() in EXIT_WORDS:
+                if self.job is not None:
+                    cancel(self.job['prompt_id'], running=self.executing is not None)
+                print("👋 Goodbye!")
+                return
+            if user_input:
+                try:
+                    self.submit(user_input)
+                except Exception as e:
+                    print(f"⚠️ Error: {e}")
+
 
 # --- MAIN LOOP ---
 if __name__ == "__main__":
     # 1. Load Workflow
-    if not os.path.exists("flux_api_workflow.json"):
-        print("❌ Error: 'flux_api_workflow.json' missing.")
+    if not os.path.exists(WORKFLOW_FILE):
+        print(f"❌ Error: '{WORKFLOW_FILE}' missing.")
         sys.exit()
 
-    with open("flux_api_workflow.json", "r", encoding="utf-8") as f:
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
         workflow = json.load(f)
 
     # 2. Connect
@@ -77,45 +226,7 @@ if __name__ == "__main__":
     print("------------------------------------------------")
 
     # 3. Interactive Loop
-    while True:
-        try:
-            # Get input from user
-            user_input = input("\n🎨 Enter Prompt: ")
-            
-            if user_input.lower() in ["exit", "quit", "q"]:
-                print("👋 Goodbye!")
-                break
-            
-            if not user_input.strip():
-                continue
-
-            print("⏳ Generating...")
-
-            # Inject Prompt & Random Seed
-            workflow["6"]["inputs"]["text"] = user_input
-            workflow["3"]["inputs"]["seed"] = random.randint(1, 10**10)
-
-            # Execute
-            images = get_images(ws, workflow)
-
-            # Save & Open
-            for node_id in images:
-                for image_data in images[node_id]:
-                    # Create a clean filename from the first few words of the prompt
-                    safe_name = "".join([c for c in user_input[:20] if c.isalnum() or c==' ']).strip().replace(" ", "_")
-                    filename = f"instant_{safe_name}.png"
-                    
-                    with open(filename, "wb") as f:
-                        f.write(image_data)
-                    
-                    print(f"✅ Saved: {filename}")
-                    
-                    # MAGIC COMMAND: Open image in Windows
-                    print("👀 Opening...")
-                    os.system(f"explorer.exe {filename}")
-
-        except KeyboardInterrupt:
-            print("\n👋 Exiting...")
-            break
-        except Exception as e:
-            print(f"⚠️ Error: {e}")
\ No newline at end of file
+    try:
+        InstantSession(ws, workflow).start().run()
+    except KeyboardInterrupt:
+        print("\n👋 Exiting...")
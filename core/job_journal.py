@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", ".vulcan_journal.sqlite")
+
+# pending -> submitted (prompt_id known) -> rendered (outputs known) -> saved; or failed
+PENDING, SUBMITTED, RENDERED, SAVED, FAILED = "pending", "submitted", "rendered", "saved", "failed"
+
+def batch_scope(catalog, ids="", shard="", workflow=""):
+    """What a batch covers; two workers with different id ranges or shards never share a batch."""
+    return json.dumps({"catalog": os.path.abspath(catalog), "ids": ids, "shard": shard,
+                       "workflow": os.path.abspath(workflow) if workflow else ""}, sort_keys=True)
+
+def job_key(job):
+    """Stable identity of a job across restarts: scenario slot, name and first sweep variant."""
+    key = f"{str(job['index']).zfill(4)}:{job['name']}"
+    if job.get('variants'):
+        key += f":v{job['variants'][0]['variant']}"
+    return key
+
+class JobJournal:
+    """Durable record of every job in a batch, so a restarted director resumes instead of starting over.
+
+    Each state change is committed immediately (SQLite WAL), so a crash loses at most the
+    transition in progress. The batch's client_id is kept too: reconnecting with it makes
+    ComfyUI route the events of prompts queued before the crash to the new process.
+    Batches are keyed by their scope (catalog, id range, shard, workflow), so workers sharing
+    one journal file each resume only their own batch.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        # Output workers mark jobs saved from their own threads; one lock serialises every statement
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30) # Other workers may hold the write lock
+        self._lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id TEXT NOT NULL,
+                scope TEXT NOT NULL DEFAULT '',
+                started REAL NOT NULL,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                batch_id INTEGER NOT NULL,
+                job_key TEXT NOT NULL,
+                job TEXT NOT NULL,
+                state TEXT NOT NULL,
+                prompt_id TEXT,
+                outputs TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (batch_id, job_key)
+            );
+        """)
+        if "scope" not in [row[1] for row in self.db.execute("PRAGMA table_info(batches)")]:
+            self.db.execute("ALTER TABLE batches ADD COLUMN scope TEXT NOT NULL DEFAULT ''") # Journals from before scopes
+        self.db.commit()
+        self.batch_id = None
+        self.client_id = None
+        self.resumed = False
+
+    def open_batch(self, client_id, scope=""):
+        """Resumes the last unfinished batch of this scope (returning its client_id) or starts a new one."""
+        with self._lock:
+            row = self.db.execute("SELECT id, client_id FROM batches WHERE finished IS NULL AND scope = ? ORDER BY id DESC LIMIT 1",
+                                  (scope,)).fetchone()
+            if row:
+                self.batch_id, self.client_id = row
+                self.resumed = True
+            else:
+                cur = self.db.execute("INSERT INTO batches (client_id, scope, started) VALUES (?, ?, ?)",
+                                      (client_id, scope, time.time()))
+                self.db.commit()
+                self.batch_id, self.client_id = cur.lastrowid, client_id
+        return self.client_id
+
+    def track(self, job):
+        """Registers a job; returns (state, journaled job). A resumed job keeps its original workflow and seed."""
+        key = job_key(job)
+        with self._lock:
+            row = self.db.execute("SELECT state, job FROM jobs WHERE batch_id = ? AND job_key = ?",
+                                  (self.batch_id, key)).fetchone()
+            if row:
+                return row[0], {**json.loads(row[1]), **{k: v for k, v in job.items() if k not in ('workflow', 'variants')}}
+            stored = {k: v for k, v in job.items() if k in ('name', 'index', 'workflow', 'variants')}
+            self.db.execute("INSERT INTO jobs (batch_id, job_key, job, state, updated) VALUES (?, ?, ?, ?, ?)",
+                            (self.batch_id, key, json.dumps(stored), PENDING, time.time()))
+            self.db.commit()
+        return PENDING, job
+
+    def mark(self, job, state, prompt_id=None, outputs=None):
+        with self._lock:
+            self.db.execute("""UPDATE jobs SET state = ?, prompt_id = COALESCE(?, prompt_id),
+                               outputs = COALESCE(?, outputs), updated = ? WHERE batch_id = ? AND job_key = ?""",
+                            (state, prompt_id, json.dumps(outputs) if outputs is not None else None,
+                             time.time(), self.batch_id, job_key(job)))
+            self.db.commit()
+
+    def unfinished(self):
+        """Jobs that reached the server but were not saved: [(state, job, prompt_id, outputs)]."""
+        rows = self.db.execute("SELECT state, job, prompt_id, outputs FROM jobs WHERE batch_id = ? AND state IN (?, ?)",
+                               (self.batch_id, SUBMITTED, RENDERED)).fetchall()
+        return [(state, json.loads(job), prompt_id, json.loads(outputs) if outputs else None)
+                for state, job, prompt_id, outputs in rows]
+
+    def counts(self):
+        return dict(self.db.execute("SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state",
+                                    (self.batch_id,)).fetchall())
+
+    def finish_batch(self):
+        """Closes the batch once nothing is left in flight, so the next run starts fresh."""
+        open_jobs = self.db.execute("SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND state IN (?, ?, ?)",
+                                    (self.batch_id, PENDING, SUBMITTED, RENDERED)).fetchone()[0]
+        if open_jobs == 0:
+            self.db.execute("UPDATE batches SET finished = ? WHERE id = ?", (time.time(), self.batch_id))
+            self.db.commit()
+        return open_jobs == 0
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIGURATION ---
+METRICS_LOG = os.getenv("METRICS_LOG", "")    # JSONL file, one record per job (empty = off)
+METRICS_PROM = os.getenv("METRICS_PROM", "")  # Prometheus text file, e.g. for node_exporter's textfile collector
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) # Serve the same text on http://0.0.0.0:PORT/metrics (0 = off)
+
+class JobMetrics:
+    """Timing breakdown of one job, fed from the director's own calls and the WebSocket events."""
+
+    def __init__(self, name, index, workflow=None):
+        self.name = name
+        self.index = index
+        self.prompt_id = None
+        self.status = "pending"
+        self.started_at = time.time()
+        self.phases = {}      # phase -> seconds
+        self.nodes = {}       # node_id -> {"class_type", "seconds"}
+        self.steps = 0
+        self.steps_per_s = None
+        self.resubmits = 0    # BackendPool failovers before the attempt that finished
+        self._class_types = {n: node.get('class_type') for n, node in (workflow or {}).items()}
+        self._t0 = time.perf_counter()
+        self._submitted = None
+        self._node = None     # (node_id, started)
+        self._progress = None # (first_value, first_time, last_value, last_time)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def submitted(self, prompt_id):
+        self.prompt_id = prompt_id
+        self._submitted = time.perf_counter()
+        self.phases['submit'] = self._submitted - self._t0
+
+    def resubmitted(self):
+        """Starts over on another engine: queue and execute times are those of the attempt that finishes."""
+        self.status = "pending"
+        self.resubmits += 1
+        for name in ('queued', 'execute'):
+            self.phases.pop(name, None)
+        self._node = None
+        self._progress = None
+
+    def on_event(self, message):
+        """Consumes one WebSocket message that belongs to this job."""
+        now = time.perf_counter()
+        data = message.get('data', {})
+        kind = message.get('type')
+
+        if kind in ('execution_start', 'executing') and 'queued' not in self.phases and self._submitted:
+            self.phases['queued'] = now - self._submitted
+            self.status = "running"
+
+        if kind == 'executing':
+            self._close_node(now)
+            if data.get('node') is None:
+                self.phases['execute'] = now - self._submitted - self.phases.get('queued', 0.0)
+            else:
+                self._node = (data['node'], now)
+
+        elif kind == 'progress':
+            value = data['value']
+            if self._progress is None:
+                self._progress = (value, now, value, now)
+            else:
+                first_value, first_time = self._progress[:2]
+                self._progress = (first_value, first_time, value, now)
+                if now > first_time:
+                    self.steps_per_s = (value - first_value) / (now - first_time)
+            self.steps = max(self.steps, value)
+
+        elif kind in ('execution_error', 'execution_interrupted'):
+            self._close_node(now)
+            self.status = "failed"
+
+    def _close_node(self, now):
+        if self._node is None:
+            return
+        node_id, started = self._node
+        entry = self.nodes.setdefault(node_id, {"class_type": self._class_types.get(node_id), "seconds": 0.0})
+        entry['seconds'] += now - started
+        self._node = None
+
+    def finish(self, status="ok"):
+        if self.status != "failed":
+            self.status = status
+        self.phases['total'] = time.perf_counter() - self._t0
+        return self
+
+    def to_dict(self):
+        return {
+            "name": self.name, "index": self.index, "prompt_id": self.prompt_id, "status": self.status,
+            "started_at": self.started_at,
+            "phases_ms": {k: round(v * 1000, 2) for k, v in self.phases.items()},
+            "nodes_ms": {n: {"class_type": e['class_type'], "ms": round(e['seconds'] * 1000, 2)}
+                         for n, e in self.nodes.items()},
+            "steps": self.steps,
+            "resubmits": self.resubmits,
+            "steps_per_s": round(self.steps_per_s, 3) if self.steps_per_s else None,
+        }
+
+class MetricsSink:
+    """Appends job records to a JSONL log and keeps Prometheus-text aggregates (file and/or HTTP)."""
+
+    def __init__(self, jsonl_path=METRICS_LOG, prom_path=METRICS_PROM, port=METRICS_PORT):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._jobs = {}        # status -> count
+        self._phases = {}      # phase -> [sum_seconds, count]
+        self._nodes = {}       # class_type -> [sum_seconds, count]
+        self._steps_per_s = None
+        if port:
+            self._serve(port)
+
+    def record(self, metrics):
+        record = metrics.to_dict()
+        with self._lock:
+            self._jobs[metrics.status] = self._jobs.get(metrics.status, 0) + 1
+            for phase, seconds in metrics.phases.items():
+                agg = self._phases.setdefault(phase, [0.0, 0])
+                agg[0] += seconds
+                agg[1] += 1
+            for entry in metrics.nodes.values():
+                agg = self._nodes.setdefault(entry['class_type'] or "unknown", [0.0, 0])
+                agg[0] += entry['seconds']
+                agg[1] += 1
+            if metrics.steps_per_s:
+                self._steps_per_s = metrics.steps_per_s
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prom_path:
+                tmp = f"{self.prom_path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(self._render())
+                os.replace(tmp, self.prom_path) # Scrapers never see half a file
+
+    def _render(self):
+        lines = ["# HELP vulcan_jobs_total Director jobs finished, by status.",
+                 "# TYPE vulcan_jobs_total counter"]
+        lines += [f'vulcan_jobs_total{{status="{s}"}} {n}' for s, n in sorted(self._jobs.items())]
+        lines += ["# HELP vulcan_job_phase_seconds Time spent per job phase (submit, queued, execute, history, download, write, encode, total).",
+                  "# TYPE vulcan_job_phase_seconds summary"]
+        for phase, (total, count) in sorted(self._phases.items()):
+            lines.append(f'vulcan_job_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+            lines.append(f'vulcan_job_phase_seconds_count{{phase="{phase}"}} {count}')
+        lines += ["# HELP vulcan_node_seconds Server-side execution time per node type.",
+                  "# TYPE vulcan_node_seconds summary"]
+        for class_type, (total, count) in sorted(self._nodes.items()):
+            lines.append(f'vulcan_node_seconds_sum{{class_type="{class_type}"}} {total:.6f}')
+            lines.append(f'vulcan_node_seconds_count{{class_type="{class_type}"}} {count}')
+        if self._steps_per_s:
+            lines += ["# HELP vulcan_sampling_steps_per_second Sampler speed of the last finished job.",
+                      "# TYPE vulcan_sampling_steps_per_second gauge",
+                      f"vulcan_sampling_steps_per_second {self._steps_per_s:.4f}"]
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, port):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with sink._lock:
+                    body = sink._render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass # Keep scrapes out of the progress bars
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"📈 Metrics on http://0.0.0.0:{port}/metrics")
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from render_cache import workflow_key
+
+# --- CONFIGURATION ---
+OUTPUT_WORKERS = int(os.getenv("OUTPUT_WORKERS", "4"))  # Threads downloading, encoding and writing finished renders
+OUTPUT_BACKLOG = int(os.getenv("OUTPUT_BACKLOG", "16")) # Queued + running tasks before submit() waits (streamed bytes sit in them)
+OUTPUT_FORMATS = [f.strip().lower() for f in os.getenv("OUTPUT_FORMATS", "").split(",") if f.strip()] # e.g. webp,jpeg
+OUTPUT_QUALITY = int(os.getenv("OUTPUT_QUALITY", "90"))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "0"))  # Longest side in px of thumbs/<name>.jpg (0 = off)
+OUTPUT_SIDECAR = os.getenv("OUTPUT_SIDECAR", "on") == "on" # <name>.json with prompt, seed, workflow hash and timings
+
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg", "jpg": ".jpg"}
+
+def describe(workflow):
+    """Prompt and seed of a workflow, wherever the text encoder and sampler nodes sit."""
+    prompt, seed = None, None
+    for node_id in sorted(workflow):
+        inputs = workflow[node_id].get('inputs', {})
+        if prompt is None and isinstance(inputs.get('text'), str):
+            prompt = inputs['text']
+        if seed is None and isinstance(inputs.get('seed'), int):
+            seed = inputs['seed']
+    return prompt, seed
+
+class OutputPipeline:
+    """Worker pool for everything after a render finishes, so the submit/receive loop never waits on the bridge or the disk.
+
+    Tasks run on OUTPUT_WORKERS threads; drain() blocks until every submitted task is done.
+    submit() blocks while OUTPUT_BACKLOG tasks are pending, so a slow disk or bridge slows the
+    submit loop down instead of piling streamed images up in memory.
+    """
+
+    def __init__(self, workers=OUTPUT_WORKERS, formats=OUTPUT_FORMATS, quality=OUTPUT_QUALITY,
+                 thumbnail=THUMBNAIL_SIZE, sidecar=OUTPUT_SIDECAR, max_backlog=OUTPUT_BACKLOG):
+        self.formats = formats
+        self.quality = quality
+        self.thumbnail = thumbnail
+        self.sidecar = sidecar
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="vulcan-output")
+        self.max_backlog = max(1, max_backlog)
+        self._pending = set()
+        self._lock = threading.Condition() # Reentrant: backlog is read while holding it
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self._lock.wait_for(lambda: self.backlog < self.max_backlog)
+            future = self._pool.submit(fn, *args)
+            self._pending.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._pending.discard(future)
+            self._lock.notify_all()
+
+    @property
+    def backlog(self):
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self):
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return
+            wait(pending)
+
+    def close(self):
+        self.drain()
+        self._pool.shutdown()
+
+    def finalize(self, path, workflow, variant=None, metrics=None):
+        """Derived files for one saved image: WebP/JPEG copies, a thumbnail and the metadata sidecar."""
+        stem = os.path.splitext(path)[0]
+        if self.formats or self.thumbnail:
+            from PIL import Image # Only needed when derived images are requested
+            with Image.open(path) as img:
+                rgb = img.convert("RGB")
+            for fmt in self.formats:
+                rgb.save(stem + EXTENSIONS.get(fmt, f".{fmt}"), quality=self.quality)
+            if self.thumbnail:
+                thumbs = os.path.join(os.path.dirname(path), "thumbs")
+                os.makedirs(thumbs, exist_ok=True)
+                rgb.thumbnail((self.thumbnail, self.thumbnail))
+                rgb.save(os.path.join(thumbs, os.path.basename(stem) + ".jpg"), quality=self.quality)
+
+        if self.sidecar:
+            prompt, seed = describe(workflow)
+            record = {"prompt": prompt, "seed": seed, "workflow_hash": workflow_key(workflow), **(variant or {}),
+                      "saved_at": time.time()}
+            if metrics is not None:
+                record["timings_ms"] = {k: round(v * 1000, 2) for k, v in metrics.phases.items()}
+            with open(stem + ".json", "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2)
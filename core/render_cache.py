@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# --- CONFIGURATION ---
+RENDER_CACHE = os.getenv("RENDER_CACHE", "off") == "on"
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", ".render_cache")
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+# "random" keeps the old behaviour; "deterministic" derives the seed from the scenario itself
+SEED_MODE = os.getenv("SEED_MODE", "random")
+SEED_SALT = os.getenv("SEED_SALT", "vulcan")
+
+def workflow_key(workflow):
+    """Canonical hash of a fully resolved workflow (prompt and seed already injected).
+
+    `_meta` only holds UI titles, so it is left out: renaming a node must not invalidate renders.
+    """
+    nodes = {node_id: {k: v for k, v in node.items() if k != '_meta'} for node_id, node in workflow.items()}
+    canonical = json.dumps(nodes, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def deterministic_seed(scene, salt=SEED_SALT):
+    """Same scenario -> same seed on every run, so unchanged scenarios hit the cache."""
+    digest = hashlib.sha256(f"{salt}|{scene['name']}|{scene['prompt']}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big") % 10**12 + 1
+
+class RenderCache:
+    """On-disk store of finished renders keyed by workflow_key, with size-based LRU eviction."""
+
+    def __init__(self, root=RENDER_CACHE_DIR, max_mb=RENDER_CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock() # Output workers store renders concurrently; evictions must not overlap
+        os.makedirs(root, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Image paths of a cached render (in output order), or None on a miss."""
+        entry = self._entry(key)
+        if not os.path.isdir(entry):
+            return None
+        os.utime(entry) # Mark as recently used
+        return sorted((os.path.join(entry, f) for f in os.listdir(entry)),
+                      key=lambda p: int(os.path.basename(p).split('.')[0]))
+
+    def put(self, key, image_paths):
+        """Copies the given files into the cache; written to a temp dir first so a crash never leaves half an entry."""
+        if not image_paths:
+            return
+        entry = self._entry(key)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        for i, path in enumerate(image_paths):
+            shutil.copyfile(path, os.path.join(tmp, f"{i}{os.path.splitext(path)[1]}"))
+        with self._lock:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.replace(tmp, entry)
+            self.evict()
+
+    def evict(self):
+        """Drops least-recently-used entries until the cache fits in max_mb."""
+        entries = []
+        total = 0
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if shard.startswith('.') or not os.path.isdir(shard_path):
+                continue
+            for key in os.listdir(shard_path):
+                entry = os.path.join(shard_path, key)
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+                total += size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,70 @@
+import csv
+import hashlib
+import json
+import os
+
+# --- CONFIGURATION ---
+SCENARIO_CATALOG = os.getenv("SCENARIO_CATALOG", "scenarios/showcase.jsonl") # .jsonl or .csv, one scenario per line
+SCENARIO_IDS = os.getenv("SCENARIO_IDS", "")       # Only this id range, e.g. 1-5000
+SCENARIO_SHARD = os.getenv("SCENARIO_SHARD", "")   # Only this hash shard, e.g. 2/4 (shard 2 of 0..3)
+
+# CSV cells are text; these columns are converted back to numbers
+INT_FIELDS = {"id", "width", "height", "steps", "seed", "variants"}
+FLOAT_FIELDS = {"lora_strength", "clip_strength"}
+
+def _from_csv(row):
+    scene = {}
+    for key, value in row.items():
+        if key is None or value is None or value.strip() == "":
+            continue # Empty cell = no override
+        value = value.strip()
+        scene[key.strip()] = int(value) if key in INT_FIELDS else float(value) if key in FLOAT_FIELDS else value
+    return scene
+
+def read_catalog(path=SCENARIO_CATALOG):
+    """Yields scenarios one line at a time, so catalogs of any length stream in constant memory.
+
+    Each scenario needs `name` and `prompt`. `id` is its stable identity and output prefix; it
+    defaults to the scenario's position. Optional overrides: negative, width, height, steps, seed,
+    unet, lora, lora_strength, clip_strength, variants, workflow.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = ((n + 2, _from_csv(row)) for n, row in enumerate(csv.DictReader(f)))
+        else:
+            rows = ((n + 1, json.loads(line)) for n, line in enumerate(f)
+                    if line.strip() and not line.lstrip().startswith("#"))
+        position = 0
+        for line_number, scene in rows:
+            position += 1
+            if not scene.get('name') or not scene.get('prompt'):
+                raise ValueError(f"{path}:{line_number}: a scenario needs a name and a prompt")
+            scene.setdefault('id', position)
+            yield scene
+
+def parse_ids(spec):
+    low, _, high = spec.partition("-")
+    return int(low), int(high) if high else int(low)
+
+def parse_shard(spec):
+    shard, _, count = spec.partition("/")
+    shard, count = int(shard), int(count)
+    if not 0 <= shard < count:
+        raise ValueError(f"Shard {spec}: expected k/n with 0 <= k < n")
+    return shard, count
+
+def in_shard(scene_id, shard, count):
+    """Hash sharding: ids spread evenly across workers whatever their numbering."""
+    return int(hashlib.sha1(str(scene_id).encode()).hexdigest(), 16) % count == shard
+
+def select(scenarios, ids=None, shard=None):
+    for scene in scenarios:
+        if ids and not ids[0] <= scene['id'] <= ids[1]:
+            continue
+        if shard and not in_shard(scene['id'], *shard):
+            continue
+        yield scene
+
+def load_scenarios(path=SCENARIO_CATALOG, ids=SCENARIO_IDS, shard=SCENARIO_SHARD):
+    """The configured catalog, restricted to this worker's id range and shard."""
+    return select(read_catalog(path), parse_ids(ids) if ids else None, parse_shard(shard) if shard else None)
@@ -0,0 +1,89 @@
+import json
+import os
+
+# "residency" groups jobs that share loaded models; "list" keeps the scenario order
+SCHEDULE = os.getenv("SCHEDULE", "residency")
+# Reorder within windows of this many jobs so long catalogs stay streamable (0 = the whole batch in memory)
+SCHEDULE_WINDOW = int(os.getenv("SCHEDULE_WINDOW", "256"))
+
+# Nodes whose outputs ComfyUI keeps cached while their inputs do not change
+UNET_LOADERS = {"UnetLoaderGGUF", "UNETLoader", "CheckpointLoaderSimple"}
+MODEL_LOADERS = UNET_LOADERS | {"DualCLIPLoader", "VAELoader"}
+LORA_LOADERS = {"LoraLoader", "LoraLoaderModelOnly"}
+
+_workflows = {}
+
+def load_workflow(path):
+    """Workflow files are read once per process, however many scenarios point at them."""
+    if path not in _workflows:
+        with open(path, "r", encoding="utf-8") as f:
+            _workflows[path] = json.load(f)
+    return _workflows[path]
+
+def apply_overrides(workflow, scene):
+    """Injects per-scenario choices: unet, lora, lora_strength, clip_strength, width, height, steps, negative."""
+    for node in workflow.values():
+        inputs = node['inputs']
+        if node['class_type'] in UNET_LOADERS and 'unet' in scene:
+            inputs['unet_name' if 'unet_name' in inputs else 'ckpt_name'] = scene['unet']
+        elif node['class_type'] in LORA_LOADERS:
+            if 'lora' in scene: inputs['lora_name'] = scene['lora']
+            if 'lora_strength' in scene: inputs['strength_model'] = scene['lora_strength']
+            if 'clip_strength' in scene and 'strength_clip' in inputs: inputs['strength_clip'] = scene['clip_strength']
+        elif node['class_type'] == "EmptyLatentImage":
+            if 'width' in scene: inputs['width'] = scene['width']
+            if 'height' in scene: inputs['height'] = scene['height']
+        elif node['class_type'] == "KSampler":
+            if 'steps' in scene: inputs['steps'] = scene['steps']
+            # The negative prompt is whichever text encoder feeds the sampler's `negative` input
+            negative = inputs.get('negative')
+            if 'negative' in scene and isinstance(negative, list) and 'text' in workflow[negative[0]]['inputs']:
+                workflow[negative[0]]['inputs']['text'] = scene['negative']
+    return workflow
+
+def _static_inputs(node):
+    """Node inputs minus links to other nodes: what decides whether ComfyUI can reuse the node's output."""
+    return tuple(sorted((k, json.dumps(v)) for k, v in node['inputs'].items() if not isinstance(v, list)))
+
+def residency_key(workflow):
+    """(models, LoRA, resolution) a job needs resident; equal keys run without any reload."""
+    models, loras, resolution = [], [], None
+    for node_id in sorted(workflow):
+        node = workflow[node_id]
+        if node['class_type'] in MODEL_LOADERS:
+            models.append((node['class_type'], _static_inputs(node)))
+        elif node['class_type'] in LORA_LOADERS:
+            loras.append(_static_inputs(node))
+        elif node['class_type'] == "EmptyLatentImage":
+            resolution = (node['inputs']['width'], node['inputs']['height'])
+    return tuple(models), tuple(loras), resolution
+
+def _reorder(window):
+    """Stable sort by first appearance of each model set, then LoRA, then resolution."""
+    first_seen = {}
+    def rank(part):
+        return first_seen.setdefault(part, len(first_seen))
+
+    keyed = []
+    for job in window:
+        models, loras, resolution = residency_key(job['workflow'])
+        keyed.append(((rank(("models", models)), rank(("lora", models, loras)),
+                       rank(("res", models, loras, resolution))), job))
+    keyed.sort(key=lambda pair: pair[0])
+    return [job for _, job in keyed]
+
+def schedule(jobs, mode=SCHEDULE, window=SCHEDULE_WINDOW):
+    """Yields jobs grouped so identical loaders run back to back and hit ComfyUI's node cache.
+
+    Output files keep their scenario index, so the saved order stays stable whatever the render order.
+    """
+    if mode != "residency":
+        yield from jobs
+        return
+    batch = []
+    for job in jobs:
+        batch.append(job)
+        if window and len(batch) >= window:
+            yield from _reorder(batch)
+            batch = []
+    yield from _reorder(batch)
@@ -0,0 +1,59 @@
+import copy
+import math
+import os
+
+# --- CONFIGURATION ---
+VRAM_GB = float(os.getenv("VRAM_GB", "6"))
+# Latent megapixels that fit per GB next to the resident Q4 UNet (rough; tune per card)
+SWEEP_MEGAPIXELS_PER_GB = float(os.getenv("SWEEP_MEGAPIXELS_PER_GB", "0.35"))
+SWEEP_MAX_BATCH = int(os.getenv("SWEEP_MAX_BATCH", "0")) # 0 = derive from VRAM_GB
+
+def max_batch_size(width, height, vram_gb=VRAM_GB):
+    """How many latents of this resolution one job can carry on the card."""
+    if SWEEP_MAX_BATCH > 0:
+        return SWEEP_MAX_BATCH
+    return max(1, int(vram_gb * SWEEP_MEGAPIXELS_PER_GB * 1e6 // (width * height)))
+
+def plan_batches(variants, limit):
+    """Splits N variants into as few batches as possible, sized as evenly as possible (e.g. 8 by 3 -> 3, 3, 2)."""
+    count = math.ceil(variants / limit)
+    base, extra = divmod(variants, count)
+    return [base + 1 if b < extra else base for b in range(count)]
+
+def sweep_jobs(job, variants):
+    """Packs N variants of one job into batched-latent jobs, each listing the seed of every image it returns.
+
+    ComfyUI draws the noise of a whole batch from one seed, so a variant is identified by
+    (seed, batch_index); isolate_variant() re-renders exactly that image on its own.
+    """
+    workflow = job['workflow']
+    latent = workflow["5"]["inputs"]
+    base_seed = workflow["3"]["inputs"]["seed"]
+    limit = max_batch_size(latent['width'], latent['height'])
+
+    done = 0
+    for b, size in enumerate(plan_batches(variants, limit)):
+        batch = copy.deepcopy(workflow)
+        seed = (base_seed + b) % 10**12 + 1 if b else base_seed
+        batch["5"]["inputs"]["batch_size"] = size
+        batch["3"]["inputs"]["seed"] = seed
+        yield {**job, "workflow": batch,
+               "variants": [{"variant": done + i + 1, "seed": seed, "batch_index": i, "batch_size": size}
+                            for i in range(size)]}
+        done += size
+
+def isolate_variant(workflow, variant):
+    """Rewrites a workflow to render only one variant of a sweep, pixel-identical to the batched render."""
+    single = copy.deepcopy(workflow)
+    single["3"]["inputs"]["seed"] = variant['seed']
+    single["5"]["inputs"]["batch_size"] = variant['batch_index'] + 1
+    if variant['batch_index'] == 0:
+        return single
+    # LatentFromBatch tags the latent with its batch index, so the sampler draws the matching noise slice
+    single["13"] = {
+        "inputs": {"samples": ["5", 0], "batch_index": variant['batch_index'], "length": 1},
+        "class_type": "LatentFromBatch",
+        "_meta": {"title": "Latent From Batch"}
+    }
+    single["3"]["inputs"]["latent_image"] = ["13", 0]
+    return single
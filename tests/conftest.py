@@ -0,0 +1,54 @@
+import copy
+import json
+import os
+import sys
+import uuid
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "core"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from mock_comfy import MockComfy, free_port
+
+WORKFLOW_FILE = os.path.join(ROOT, "workflows", "flux_api_workflow.json")
+
+@pytest.fixture
+def workflow():
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@pytest.fixture
+def make_jobs(workflow):
+    """n jobs with distinct prompts and fixed seeds, so the same call yields the same workflows."""
+    def make(count, prefix="scene"):
+        jobs = []
+        for i in range(count):
+            dag = copy.deepcopy(workflow)
+            dag["6"]["inputs"]["text"] = f"{prefix}_{i}"
+            dag["3"]["inputs"]["seed"] = i + 1
+            jobs.append({"name": f"{prefix}_{i}", "index": i + 1, "workflow": dag})
+        return jobs
+    return make
+
+@pytest.fixture
+def mock_server():
+    """Factory for fast in-process ComfyUI mocks, all stopped after the test."""
+    servers = []
+
+    def start(latency=0.05, steps=2, **kwargs):
+        server = MockComfy(free_port(), latency, steps, seed=len(servers), **kwargs).start_in_thread()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+@pytest.fixture
+def mock(mock_server):
+    return mock_server()
+
+@pytest.fixture
+def client_id():
+    return str(uuid.uuid4())
@@ -0,0 +1,45 @@
+import asyncio
+import copy
+import json
+import os
+import threading
+from backend_pool import BackendPool
+from director import output_path
+from job_metrics import MetricsSink
+
+def run_pool(servers, jobs, out, metrics=None, stop=None):
+    async def main():
+        pool = BackendPool([s.address for s in servers], "pool-test", str(out), per_backend=2, metrics=metrics)
+        await pool.start()
+        if stop is not None:
+            # MockComfy.stop() blocks until its loop exits; never call it from the client's loop
+            threading.Timer(0.3, stop.stop).start()
+        try:
+            await pool.run_batch(jobs)
+        finally:
+            await pool.close()
+    asyncio.run(main())
+
+def test_pool_fails_over_when_an_engine_dies(mock_server, make_jobs, tmp_path):
+    servers = [mock_server(latency=0.2), mock_server(latency=0.2)]
+    jobs = make_jobs(8)
+    log = tmp_path / "metrics.jsonl"
+    run_pool(servers, jobs, tmp_path / "out", MetricsSink(str(log), "", 0), stop=servers[1])
+
+    for job in jobs:
+        assert os.path.exists(output_path(str(tmp_path / "out"), job['name'], job['index']))
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert sorted(r['name'] for r in records) == sorted(j['name'] for j in jobs)
+    assert all(r['status'] == "ok" for r in records)
+    assert any(r['resubmits'] for r in records)
+
+def test_pool_does_not_retry_a_rejected_workflow(mock_server, make_jobs, tmp_path):
+    servers = [mock_server(), mock_server()]
+    jobs = make_jobs(3)
+    jobs[1] = {**jobs[1], "workflow": copy.deepcopy(jobs[1]['workflow'])}
+    jobs[1]['workflow']["4"]["class_type"] = "NotInstalledLoader"
+    run_pool(servers, jobs, tmp_path)
+
+    assert sum(s.counter for s in servers) == 2 # HTTP 400 from /prompt: neither retried nor evicted
+    assert not os.path.exists(output_path(str(tmp_path), jobs[1]['name'], jobs[1]['index']))
+    assert all(os.path.exists(output_path(str(tmp_path), j['name'], j['index'])) for j in (jobs[0], jobs[2]))
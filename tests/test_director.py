@@ -0,0 +1,141 @@
+import copy
+import json
+import os
+import director
+import seed_sweep
+from director import VulcanDirector, output_path
+from job_journal import JobJournal, SUBMITTED, SAVED, FAILED
+from render_cache import RenderCache, workflow_key
+
+def run(mock, client_id, jobs, out, setup=None, **kwargs):
+    d = VulcanDirector(mock.address, client_id, output_folder=str(out), **kwargs)
+    if setup: setup(d)
+    d.connect()
+    try:
+        d.run_pipelined(jobs, depth=2)
+    finally:
+        d.output.close()
+        d.ws.close()
+    return d
+
+def test_pipelined_batch_saves_every_job(mock, client_id, make_jobs, tmp_path):
+    jobs = make_jobs(5)
+    run(mock, client_id, jobs, tmp_path)
+    assert mock.counter == 5
+    assert all(os.path.exists(output_path(str(tmp_path), j['name'], j['index'])) for j in jobs)
+
+def test_rejected_prompt_does_not_abort_the_batch(mock, client_id, make_jobs, tmp_path):
+    jobs = make_jobs(4)
+    jobs[1]['workflow']["4"]["class_type"] = "NotInstalledLoader" # /prompt answers HTTP 400
+    journal = JobJournal(str(tmp_path / "journal.sqlite"))
+    journal.open_batch(client_id)
+    run(mock, client_id, jobs, tmp_path / "out", journal=journal)
+
+    assert mock.counter == 3
+    assert not os.path.exists(output_path(str(tmp_path / "out"), jobs[1]['name'], jobs[1]['index']))
+    for job in jobs[:1] + jobs[2:]:
+        assert os.path.exists(output_path(str(tmp_path / "out"), job['name'], job['index']))
+    assert journal.counts() == {SAVED: 3, FAILED: 1}
+
+def test_journal_resumes_without_rendering_twice(mock, client_id, make_jobs, tmp_path):
+    """A crashed run left one job saved and two submitted to the server but never downloaded."""
+    jobs = make_jobs(5)
+    journal = JobJournal(str(tmp_path / "journal.sqlite"))
+    journal.open_batch(client_id, "scope")
+    for job in jobs:
+        journal.track(job)
+    journal.mark(jobs[0], SAVED)
+    queued = director.HTTP.post_json(mock.address, "/prompt", {"prompt": jobs[1]['workflow'], "client_id": client_id})
+    journal.mark(jobs[1], SUBMITTED, queued['prompt_id'])
+    finished = director.HTTP.post_json(mock.address, "/prompt", {"prompt": jobs[2]['workflow'], "client_id": client_id})
+    journal.mark(jobs[2], SUBMITTED, finished['prompt_id'])
+    before = mock.counter
+
+    resumed = JobJournal(str(tmp_path / "journal.sqlite"))
+    assert resumed.open_batch("new-client", "scope") == client_id
+    run(mock, resumed.client_id, jobs, tmp_path / "out", journal=resumed)
+
+    assert mock.counter - before == 2 # Only the two jobs that never reached the server
+    assert not os.path.exists(output_path(str(tmp_path / "out"), jobs[0]['name'], jobs[0]['index']))
+    for job in jobs[1:]:
+        assert os.path.exists(output_path(str(tmp_path / "out"), job['name'], job['index']))
+    assert resumed.counts() == {SAVED: 5}
+    assert resumed.finish_batch()
+
+def test_journal_batches_are_scoped(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    JobJournal(path).open_batch("shard-0", "scope-0")
+    other = JobJournal(path)
+    assert other.open_batch("shard-1", "scope-1") == "shard-1"
+    assert not other.resumed
+    assert JobJournal(path).open_batch("late", "scope-0") == "shard-0"
+
+def test_render_cache_serves_identical_workflows(mock, client_id, make_jobs, tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    jobs = make_jobs(3)
+    run(mock, client_id, jobs, tmp_path / "first", cache=cache)
+    assert mock.counter == 3
+
+    run(mock, client_id, make_jobs(3) + make_jobs(1, prefix="edited"), tmp_path / "second", cache=cache)
+    assert mock.counter == 4 # Only the edited scenario reaches the server
+    for job in jobs:
+        first = output_path(str(tmp_path / "first"), job['name'], job['index'])
+        second = output_path(str(tmp_path / "second"), job['name'], job['index'])
+        with open(first, "rb") as a, open(second, "rb") as b:
+            assert a.read() == b.read()
+
+def test_partial_sweep_is_not_cached(mock, client_id, make_jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(seed_sweep, "SWEEP_MAX_BATCH", 3)
+    cache = RenderCache(str(tmp_path / "cache"))
+    sweep = list(seed_sweep.sweep_jobs(make_jobs(1)[0], 3))
+
+    def lose_v01(d):
+        fetch = d.fetch_image
+        d.fetch_image = lambda img, scene, dest: not dest.endswith("_v01.png") and fetch(img, scene, dest)
+    run(mock, client_id, sweep, tmp_path / "first", setup=lose_v01, cache=cache)
+    assert mock.counter == 1
+
+    run(mock, client_id, copy.deepcopy(sweep), tmp_path / "second", cache=cache)
+    assert mock.counter == 2 # Rendered again instead of served from a two-image entry
+    run(mock, client_id, copy.deepcopy(sweep), tmp_path / "third", cache=cache)
+    assert mock.counter == 2
+    for variant in sweep[0]['variants']:
+        with open(output_path(str(tmp_path / "third"), sweep[0]['name'], sweep[0]['index'], variant)[:-len(".png")] + ".json") as f:
+            assert json.load(f)['batch_index'] == variant['batch_index']
+
+def test_incomplete_cache_entry_is_a_miss(mock, client_id, make_jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(seed_sweep, "SWEEP_MAX_BATCH", 3)
+    cache = RenderCache(str(tmp_path / "cache"))
+    sweep = list(seed_sweep.sweep_jobs(make_jobs(1)[0], 3))
+    image = tmp_path / "image.png"
+    image.write_bytes(b"png")
+    cache.put(workflow_key(sweep[0]['workflow']), [str(image), str(image)]) # Written before partial sweeps were refused
+
+    run(mock, client_id, sweep, tmp_path / "out", cache=cache)
+    assert mock.counter == 1
+    assert len(cache.get(workflow_key(sweep[0]['workflow']))) == 3
+
+def test_seed_sweep_batches_variants(mock, client_id, make_jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(seed_sweep, "SWEEP_MAX_BATCH", 2)
+    job = make_jobs(1)[0]
+    sweep = list(seed_sweep.sweep_jobs(job, 5))
+    assert [j['workflow']["5"]["inputs"]["batch_size"] for j in sweep] == [2, 2, 1]
+
+    run(mock, client_id, sweep, tmp_path)
+    assert mock.counter == 3
+    seeds = set()
+    for n in range(1, 6):
+        variant = {"variant": n}
+        with open(output_path(str(tmp_path), job['name'], job['index'], variant)[:-len(".png")] + ".json") as f:
+            record = json.load(f)
+        assert record['variant'] == n
+        seeds.add((record['seed'], record['batch_index']))
+    assert len(seeds) == 5
+
+def test_isolate_variant_rerenders_one_image(make_jobs):
+    job = make_jobs(1)[0]
+    variant = list(seed_sweep.sweep_jobs(job, 3))[0]['variants'][1]
+    single = seed_sweep.isolate_variant(job['workflow'], variant)
+    assert single["3"]["inputs"]["seed"] == variant['seed']
+    assert single["13"]["inputs"]["batch_index"] == 1
+    assert single["3"]["inputs"]["latent_image"] == ["13", 0]
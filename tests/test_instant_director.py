@@ -0,0 +1,71 @@
+import threading
+import time
+import pytest
+import websocket
+import instant_director
+from comfy_http import HTTP
+
+@pytest.fixture
+def session(mock_server, workflow, monkeypatch, tmp_path):
+    """An InstantSession on a legacy mock, whose /interrupt stops whatever runs; yields (mock, session, saves)."""
+    mock = mock_server(latency=0.5, steps=5, legacy_interrupt=True)
+    monkeypatch.setattr(instant_director, "SERVER_ADDRESS", mock.address)
+    monkeypatch.setattr(instant_director, "PREVIEW_FILE", str(tmp_path / "preview"))
+    saves, saved = [], threading.Event()
+
+    def save(images, text):
+        saves.append((text, sum(len(v) for v in images.values())))
+        saved.set()
+
+    ws = websocket.WebSocket()
+    ws.connect(f"ws://{mock.address}/ws?clientId={instant_director.CLIENT_ID}")
+    s = instant_director.InstantSession(ws, workflow, save=save).start(read_input=False)
+    s.saved = saved
+    loop = threading.Thread(target=s.run, daemon=True)
+    loop.start()
+    yield mock, s, saves
+    s.events.put(("input", instant_director.EXIT_WORDS[0]))
+    loop.join(5)
+    ws.close()
+
+def wait_for(condition, timeout=5):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.01)
+
+def statuses(mock):
+    return sorted(h['status']['status_str'] for h in mock.history.values())
+
+def test_new_prompt_cancels_the_running_one_only(session):
+    mock, s, saves = session
+    s.events.put(("input", "first"))
+    wait_for(lambda: s.executing is not None and s.job is not None and s.executing[0] == s.job['prompt_id'])
+    s.events.put(("input", "second"))
+
+    assert s.saved.wait(5)
+    time.sleep(0.2) # A second /interrupt would have landed by now
+    assert saves == [("second", 1)]
+    assert statuses(mock) == ["error", "success"]
+
+def test_new_prompt_deletes_a_queued_one(session):
+    mock, s, saves = session
+    s.events.put(("input", "first"))
+    s.events.put(("input", "second")) # Typed before "first" starts: deleted from the queue or interrupted once
+    s.events.put(("input", "third"))
+
+    assert s.saved.wait(5)
+    time.sleep(0.2)
+    assert saves == [("third", 1)]
+    assert statuses(mock)[-1] == "success" and statuses(mock).count("success") == 1
+
+def test_interrupted_job_is_not_saved(session):
+    mock, s, saves = session
+    s.events.put(("input", "first"))
+    wait_for(lambda: mock.running is not None)
+    HTTP.post_json(mock.address, "/interrupt", {})
+
+    wait_for(lambda: s.job is None)
+    time.sleep(0.2)
+    assert saves == []
+    assert statuses(mock) == ["error"]
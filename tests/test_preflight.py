@@ -0,0 +1,33 @@
+import copy
+import check_bridge
+from check_bridge import validate_workflow
+from mock_comfy import OBJECT_INFO
+
+def test_shipped_workflow_is_valid(workflow):
+    assert validate_workflow(workflow, OBJECT_INFO) == []
+
+def test_validation_errors(workflow):
+    broken = copy.deepcopy(workflow)
+    broken["3"]["inputs"]["steps"] = 0
+    broken["3"]["inputs"]["seed"] = "42"
+    broken["4"]["class_type"] = "NotInstalledLoader"
+    broken["8"]["inputs"]["samples"] = ["3", 5]
+    errors = validate_workflow(broken, OBJECT_INFO)
+    assert any("'steps' = 0 outside" in e for e in errors)
+    assert any("'seed' must be INT" in e for e in errors)
+    assert any("unknown node type" in e for e in errors)
+    assert any("links to output 5 of node 3" in e for e in errors)
+
+def test_preflight_against_the_server(mock, workflow, tmp_path, monkeypatch):
+    monkeypatch.setattr(check_bridge, "OBJECT_INFO_CACHE", str(tmp_path / "object_info.json"))
+    good = tmp_path / "good.json"
+    good.write_text(check_bridge.json.dumps(workflow))
+    bad = copy.deepcopy(workflow)
+    bad["4"]["class_type"] = "NotInstalledLoader"
+    bad_file = tmp_path / "bad.json"
+    bad_file.write_text(check_bridge.json.dumps(bad))
+
+    assert check_bridge.preflight(mock.address, [str(good)], warmup=True)
+    assert mock.counter == 1 # The warm-up render
+    assert not check_bridge.preflight(mock.address, [str(bad_file)])
+    assert (tmp_path / "object_info.json").exists()
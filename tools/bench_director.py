@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import websocket
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "core"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import director
+import instant_director
+from async_director import AsyncVulcanDirector
+from backend_pool import BackendPool
+from mock_comfy import MockComfy, free_port
+
+WORKFLOW_FILE = os.path.join(ROOT, "workflows", "flux_api_workflow.json")
+
+def make_jobs(workflow_dag, count):
+    """Synthetic jobs whose prompt text doubles as the job id for the timing hooks."""
+    jobs = []
+    for i in range(count):
+        workflow = copy.deepcopy(workflow_dag)
+        workflow["6"]["inputs"]["text"] = f"bench_{i:04}"
+        workflow["3"]["inputs"]["seed"] = i + 1
+        jobs.append({"name": f"bench_{i:04}", "index": i + 1, "workflow": workflow})
+    return jobs
+
+class Timings:
+    """Submit and saved timestamps per job, recorded by wrapping the directors' own methods."""
+
+    def __init__(self):
+        self.submitted = {}
+        self.saved = {}
+        self.first_preview = {} # instant modes: time to the first latent preview
+
+    def wrap(self, target):
+        queue_prompt, save_output = target.queue_prompt, target.save_output
+
+        if asyncio.iscoroutinefunction(queue_prompt):
+            async def timed_queue(workflow):
+                self.submitted[workflow["6"]["inputs"]["text"]] = time.perf_counter()
+                return await queue_prompt(workflow)
+            async def timed_save(outputs, scene_name, *args):
+                result = await save_output(outputs, scene_name, *args)
+                self.saved[scene_name] = time.perf_counter()
+                return result
+        else:
+            def timed_queue(workflow):
+                self.submitted[workflow["6"]["inputs"]["text"]] = time.perf_counter()
+                return queue_prompt(workflow)
+            def timed_save(outputs, scene_name, *args):
+                result = save_output(outputs, scene_name, *args)
+                self.saved[scene_name] = time.perf_counter()
+                return result
+
+        target.queue_prompt, target.save_output = timed_queue, timed_save
+        return target
+
+    def latencies(self):
+        return sorted(self.saved[name] - self.submitted[name] for name in self.saved)
+
+# --- MODES ---
+def run_sync(mocks, jobs, out, depth):
+    timings = Timings()
+    d = timings.wrap(director.VulcanDirector(mocks[0].address, str(uuid.uuid4()), output_folder=out))
+    d.connect()
+    d.run_pipelined(jobs, depth=depth)
+    d.ws.close()
+    return timings
+
+def run_async(mocks, jobs, out, depth):
+    timings = Timings()
+
+    async def main():
+        d = timings.wrap(AsyncVulcanDirector(mocks[0].address, str(uuid.uuid4()), output_folder=out))
+        await d.connect()
+        await d.run_batch(jobs, concurrency=depth)
+        await d.close()
+
+    asyncio.run(main())
+    return timings
+
+def run_pool(mocks, jobs, out, depth):
+    timings = Timings()
+
+    async def main():
+        pool = BackendPool([m.address for m in mocks], str(uuid.uuid4()), out, per_backend=depth)
+        for backend in pool.backends:
+            timings.wrap(backend.director)
+        await pool.start()
+        await pool.run_batch(jobs)
+        await pool.close()
+
+    asyncio.run(main())
+    return timings
+
+def run_instant(mocks, jobs, out, depth, superseded=False):
+    """The interactive InstantSession, fed one prompt after another as if typed.
+
+    With `superseded`, a throwaway prompt is typed right before each real one, so every job also
+    pays for cancelling the stale render (queue delete or interrupt).
+    """
+    timings = Timings()
+    instant_director.SERVER_ADDRESS = mocks[0].address
+    instant_director.PREVIEW_FILE = os.path.join(out, "instant_preview")
+    done = threading.Event()
+
+    def save(images, text):
+        for node_id in images:
+            for image_data in images[node_id]:
+                with open(os.path.join(out, f"instant_{text}.png"), "wb") as f:
+                    f.write(image_data)
+        timings.saved[text] = time.perf_counter()
+        done.set()
+
+    ws = websocket.WebSocket()
+    ws.connect(f"ws://{mocks[0].address}/ws?clientId={instant_director.CLIENT_ID}")
+    session = instant_director.InstantSession(ws, jobs[0]['workflow'], save=save).start(read_input=False)
+    on_frame = session.on_frame
+
+    def timed_frame(frame):
+        job, executing = session.job, session.executing # Same filter on_frame applies to stale frames
+        if (job is not None and executing is not None and executing[0] == job['prompt_id']
+                and job['text'] in timings.submitted and job['text'] not in timings.first_preview):
+            timings.first_preview[job['text']] = time.perf_counter() - timings.submitted[job['text']]
+        on_frame(frame)
+    session.on_frame = timed_frame
+
+    def type_prompts():
+        for job in jobs:
+            done.clear()
+            if superseded:
+                session.events.put(("input", f"stale_{job['name']}"))
+                time.sleep(0.05) # Typed just long enough ago to be queued or on the GPU
+            timings.submitted[job['name']] = time.perf_counter()
+            session.events.put(("input", job['name']))
+            done.wait(60)
+        session.events.put(("input", instant_director.EXIT_WORDS[0]))
+
+    threading.Thread(target=type_prompts, daemon=True).start()
+    session.run()
+    ws.close()
+    return timings
+
+MODES = {
+    "sequential": (run_sync, 1),
+    "pipelined": (run_sync, None),
+    "async": (run_async, None),
+    "instant": (run_instant, 1),
+    "instant-cancel": (lambda *a: run_instant(*a, superseded=True), 1),
+    "pool": (run_pool, None),
+}
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+def bench_mode(name, args, workflow_dag):
+    runner, fixed_depth = MODES[name]
+    gpus = args.gpus if name == "pool" else 1
+    mocks = [MockComfy(free_port(), args.latency, args.steps, args.fail_rate, args.reset_rate,
+                       previews=args.previews, seed=i).start_in_thread()
+             for i in range(gpus)]
+    jobs = make_jobs(workflow_dag, args.jobs)
+
+    with tempfile.TemporaryDirectory() as out:
+        start = time.perf_counter()
+        timings = runner(mocks, jobs, out, fixed_depth or args.depth)
+        wall = time.perf_counter() - start
+    for m in mocks:
+        m.stop()
+
+    latencies = timings.latencies()
+    busy = sum(m.busy_seconds for m in mocks)
+    result = {
+        "mode": name, "gpus": gpus, "jobs": args.jobs, "completed": len(latencies),
+        "wall_s": round(wall, 3),
+        "throughput_jobs_per_s": round(len(latencies) / wall, 3),
+        # GPU time not spent rendering, spread over the jobs: what orchestration costs per job
+        "overhead_ms_per_job": round((wall * gpus - busy) / max(1, args.jobs) * 1000, 1),
+    }
+    if latencies:
+        for q in (50, 95, 99):
+            result[f"p{q}_ms"] = round(percentile(latencies, q) * 1000, 1)
+    if timings.first_preview:
+        result["first_preview_p50_ms"] = round(percentile(sorted(timings.first_preview.values()), 50) * 1000, 1)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drives the directors against mock ComfyUI servers and reports throughput.")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated GPU seconds per render")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2, help="prompts kept queued per server")
+    parser.add_argument("--gpus", type=int, default=2, help="mock servers for the pool mode")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--previews", action="store_true", help="mock servers send latent previews (instant modes time the first one)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-overhead-ms", type=float, help="exit 1 if a pipelined mode exceeds this (CI guard)")
+    args = parser.parse_args()
+
+    with open(WORKFLOW_FILE, "r", encoding="utf-8") as f:
+        workflow_dag = json.load(f)
+
+    print(f"⏱️ {args.jobs} jobs x {args.latency}s simulated render, depth {args.depth}")
+    results = []
+    for name in args.modes.split(","):
+        result = bench_mode(name, args, workflow_dag)
+        results.append(result)
+
+    print(f"\n{'mode':<15}{'gpus':>5}{'done':>6}{'jobs/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'overhead ms/job':>17}{'1st preview ms':>16}")
+    for r in results:
+        print(f"{r['mode']:<15}{r['gpus']:>5}{r['completed']:>6}{r['throughput_jobs_per_s']:>9}"
+              f"{r.get('p50_ms', '-'):>10}{r.get('p95_ms', '-'):>10}{r.get('p99_ms', '-'):>10}{r['overhead_ms_per_job']:>17}"
+              f"{r.get('first_preview_p50_ms', '-'):>16}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_overhead_ms is not None:
+        slow = [r['mode'] for r in results
+                if r['mode'] in ("pipelined", "async", "pool") and r['overhead_ms_per_job'] > args.max_overhead_ms]
+        if slow:
+            print(f"❌ Orchestration overhead above {args.max_overhead_ms} ms/job: {', '.join(slow)}")
+            sys.exit(1)
+        print("✅ Orchestration overhead within budget.")
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import statistics
+import urllib.request
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from comfy_http import ComfyHTTP
+
+load_dotenv(dotenv_path=os.path.join(os.getcwd(), '.env'))
+
+# --- CONFIGURATION ---
+SERVER = os.getenv("COMFYUI_SERVER", "localhost:8188")
+ENDPOINT = "/queue"   # Cheap, side-effect free call that every director makes in some form
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+
+def measure(label, call):
+    """Times REQUESTS sequential calls and prints per-call latency in ms."""
+    call() # Warm-up (DNS, first handshake)
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(samples):7.2f} ms | p50 {statistics.median(samples):7.2f} ms | p95 {p95:7.2f} ms")
+    return statistics.mean(samples)
+
+def run_benchmark():
+    print(f"⏱️ {REQUESTS} x GET http://{SERVER}{ENDPOINT}")
+
+    def urlopen_call():
+        with urllib.request.urlopen(f"http://{SERVER}{ENDPOINT}", timeout=30) as resp:
+            resp.read()
+
+    client = ComfyHTTP()
+    baseline = measure("urlopen (new socket)", urlopen_call)
+    pooled = measure("ComfyHTTP (keep-alive)", lambda: client.get_bytes(SERVER, ENDPOINT))
+    client.close()
+
+    print(f"✅ Per-call overhead saved: {baseline - pooled:.2f} ms ({baseline / pooled:.1f}x faster)")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,29 +1,228 @@
+import argparse
+import copy
+import difflib
+import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
 import urllib.request
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from comfy_http import HTTP
+from scheduler import apply_overrides, load_workflow
+from scenario_catalog import SCENARIO_CATALOG, read_catalog
+
 # Explicitly point to the .env in the root
 env_path = os.path.join(os.getcwd(), '.env')
 load_dotenv(dotenv_path=env_path)
 
-def verify_system():
-    server = os.getenv("COMFYUI_SERVER")
-    
-    if not server:
+WORKFLOW_FILE = os.getenv("WORKFLOW_FILE", "workflows/flux_api_workflow.json")
+OBJECT_INFO_CACHE = ".object_info_cache.json" # server -> {"fetched", "info"}; the node catalogue is several MB
+OBJECT_INFO_TTL = 3600                        # Seconds before the cached /object_info is fetched again
+WARMUP_TIMEOUT = 600                          # Cold-loading UNet + T5 over the bridge can take minutes
+
+def verify_system(workflow_files=None, catalog=None, warmup=False, refresh=False):
+    # COMFYUI_SERVERS (comma-separated pool) takes precedence over the single COMFYUI_SERVER
+    servers = os.getenv("COMFYUI_SERVERS") or os.getenv("COMFYUI_SERVER")
+
+    if not servers:
         print("❌ [CRITICAL]: COMFYUI_SERVER not found in .env file!")
         print(f"   Searching in: {env_path}")
-        return
+        return False
+
+    ok = True
+    for server in [s.strip() for s in servers.split(",") if s.strip()]:
+        if not verify_server(server):
+            ok = False
+        elif workflow_files:
+            ok = preflight(server, workflow_files, catalog, warmup, refresh) and ok
+    return ok
 
+def verify_server(server):
     print(f"🔍 Testing connection to: http://{server}/history")
-    
+
     try:
         # Use a short timeout to prevent hanging
         with urllib.request.urlopen(f"http://{server}/history", timeout=3) as resp:
             print(f"✅ [NETWORK]: Successfully connected to Windows Engine.")
+            return True
     except Exception as e:
         print(f"❌ [NETWORK]: Connection failed.")
         print(f"   Error: {e}")
         print("   TIP: Ensure ComfyUI is running on Windows with --listen 0.0.0.0")
+        return False
+
+# --- OBJECT INFO ---
+def fetch_object_info(server, refresh=False):
+    """The server's node catalogue, fetched once and cached on disk for OBJECT_INFO_TTL seconds."""
+    cache = {}
+    if os.path.exists(OBJECT_INFO_CACHE):
+        with open(OBJECT_INFO_CACHE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    entry = cache.get(server)
+    if entry and not refresh and time.time() - entry['fetched'] < OBJECT_INFO_TTL:
+        return entry['info']
+
+    info = HTTP.get_json(server, "/object_info", timeout=60)
+    cache[server] = {"fetched": time.time(), "info": info}
+    with open(OBJECT_INFO_CACHE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(OBJECT_INFO_CACHE + ".tmp", OBJECT_INFO_CACHE)
+    return info
+
+def combo_options(spec):
+    """Allowed values of a COMBO input (legacy [[...]] or newer ["COMBO", {"options": [...]}]), else None."""
+    if isinstance(spec[0], list):
+        return spec[0]
+    if spec[0] == "COMBO":
+        return spec[1].get("options", []) if len(spec) > 1 else []
+    return None
+
+def types_match(expected, produced):
+    if "*" in (expected, produced):
+        return True
+    return bool(set(expected.split(",")) & set(produced.split(",")))
+
+def validate_workflow(workflow, object_info):
+    """Errors that would make ComfyUI reject the prompt, found before it reaches the queue."""
+    errors = []
+    for node_id, node in workflow.items():
+        class_type = node.get('class_type')
+        where = f"node {node_id} ({class_type})"
+        if class_type not in object_info:
+            errors.append(f"{where}: unknown node type (custom node not installed?)")
+            continue
+        spec = object_info[class_type]['input']
+        required = spec.get('required', {})
+        known = {**spec.get('optional', {}), **required}
+        inputs = node.get('inputs', {})
+
+        for name in required:
+            if name not in inputs:
+                errors.append(f"{where}: missing required input '{name}'")
+        for name, value in inputs.items():
+            if name not in known:
+                close = difflib.get_close_matches(name, known, n=1)
+                errors.append(f"{where}: unexpected input '{name}'" + (f" (did you mean '{close[0]}'?)" if close else ""))
+                continue
+            input_spec = known[name]
+            if isinstance(value, list):
+                errors.extend(_check_link(where, name, value, input_spec, workflow, object_info))
+                continue
+            options = combo_options(input_spec)
+            if options is not None:
+                if value not in options:
+                    close = difflib.get_close_matches(str(value), [str(o) for o in options], n=1)
+                    errors.append(f"{where}: '{name}' = '{value}' is not available on the server"
+                                  + (f" (closest: '{close[0]}')" if close else ""))
+            elif input_spec[0] in ("INT", "FLOAT"):
+                limits = input_spec[1] if len(input_spec) > 1 else {}
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or (input_spec[0] == "INT" and not isinstance(value, int)):
+                    errors.append(f"{where}: '{name}' must be {input_spec[0]}, got {value!r}")
+                elif not limits.get('min', value) <= value <= limits.get('max', value):
+                    errors.append(f"{where}: '{name}' = {value} outside [{limits.get('min')}, {limits.get('max')}]")
+    return errors
+
+def _check_link(where, name, link, input_spec, workflow, object_info):
+    source_id, slot = link[0], link[1]
+    source = workflow.get(str(source_id))
+    if source is None:
+        return [f"{where}: '{name}' links to missing node {source_id}"]
+    outputs = object_info.get(source.get('class_type'), {}).get('output')
+    if outputs is None:
+        return [] # Unknown source type is already reported on its own
+    if not 0 <= slot < len(outputs):
+        return [f"{where}: '{name}' links to output {slot} of node {source_id}, which has {len(outputs)}"]
+    expected = input_spec[0] if isinstance(input_spec[0], str) else "COMBO"
+    if not types_match(expected, outputs[slot]):
+        return [f"{where}: '{name}' expects {expected} but node {source_id} output {slot} is {outputs[slot]}"]
+    return []
+
+def catalog_workflows(workflow_file, catalog):
+    """The base workflow plus every distinct model/workflow override combination the catalog asks for."""
+    yield workflow_file, load_workflow(workflow_file)
+    if not catalog or not os.path.exists(catalog):
+        return
+    seen = set()
+    for scene in read_catalog(catalog):
+        overrides = {k: scene[k] for k in ("workflow", "unet", "lora", "width", "height", "steps") if k in scene}
+        key = json.dumps(overrides, sort_keys=True)
+        if not overrides or key in seen:
+            continue
+        seen.add(key)
+        base = load_workflow(scene['workflow']) if 'workflow' in scene else load_workflow(workflow_file)
+        yield f"{catalog} id {scene['id']} ({scene['name']})", apply_overrides(copy.deepcopy(base), scene)
+
+# --- WARM-UP ---
+def warmup_workflow(workflow):
+    """Same loaders, 1 step on a tiny latent, nothing written to disk: loads every model for next to no GPU time."""
+    tiny = copy.deepcopy(workflow)
+    for node in tiny.values():
+        if node['class_type'] == "EmptyLatentImage":
+            node['inputs'].update(width=256, height=256, batch_size=1)
+        elif node['class_type'] == "KSampler":
+            node['inputs']['steps'] = 1
+        elif node['class_type'] in ("SaveImage", "SaveImageWebsocket"):
+            node['class_type'] = "PreviewImage"
+            node['inputs'] = {"images": node['inputs']['images']}
+    return tiny
+
+def warm_up(server, workflow):
+    start = time.perf_counter()
+    prompt_id = HTTP.post_json(server, "/prompt", {"prompt": warmup_workflow(workflow)})['prompt_id']
+    while time.perf_counter() - start < WARMUP_TIMEOUT:
+        history = HTTP.get_json(server, f"/history/{prompt_id}")
+        if prompt_id in history:
+            status = history[prompt_id].get('status', {})
+            if status.get('status_str') == "error":
+                raise RuntimeError(f"warm-up render failed: {status}")
+            return time.perf_counter() - start
+        time.sleep(0.5)
+    raise TimeoutError(f"warm-up not finished after {WARMUP_TIMEOUT}s")
+
+def preflight(server, workflow_files, catalog=None, warmup=False, refresh=False):
+    """Validates workflows against the server's /object_info, then optionally pre-loads the models."""
+    try:
+        object_info = fetch_object_info(server, refresh)
+    except Exception as e:
+        print(f"❌ [PREFLIGHT]: /object_info unavailable: {e}")
+        return False
+    print(f"📚 [PREFLIGHT]: {len(object_info)} node types known to {server}")
+
+    ok = True
+    for workflow_file in workflow_files:
+        for label, workflow in catalog_workflows(workflow_file, catalog):
+            errors = validate_workflow(workflow, object_info)
+            if errors:
+                ok = False
+                print(f"❌ [WORKFLOW]: {label}")
+                for error in errors:
+                    print(f"   - {error}")
+            else:
+                print(f"✅ [WORKFLOW]: {label}")
+    if not ok:
+        print("   TIP: a model missing from the cache may just be new; rerun with --refresh")
+        return False
+
+    if warmup:
+        try:
+            seconds = warm_up(server, load_workflow(workflow_files[0]))
+            print(f"🔥 [WARM-UP]: models resident after {seconds:.1f}s")
+        except Exception as e:
+            print(f"❌ [WARM-UP]: {e}")
+            return False
+    return True
 
 if __name__ == "__main__":
-    verify_system()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Checks the bridge, validates workflows against /object_info and warms up the models.")
+    parser.add_argument("--workflow", action="append", help=f"workflow to validate (repeatable, default {WORKFLOW_FILE})")
+    parser.add_argument("--catalog", default=SCENARIO_CATALOG, help="also validate the model overrides of this scenario catalog")
+    parser.add_argument("--no-validate", action="store_true", help="only test the connection")
+    parser.add_argument("--warmup", action="store_true", help="run a 1-step render so the models are resident before the batch")
+    parser.add_argument("--refresh", action="store_true", help="refetch /object_info instead of using the cache")
+    args = parser.parse_args()
+
+    workflows = None if args.no_validate else (args.workflow or [WORKFLOW_FILE])
+    if not verify_system(workflows, args.catalog, args.warmup, args.refresh):
+        sys.exit(1)
@@ -1,97 +1,152 @@
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
+import argparse
 import os
-import glob
+import re
+import sys
 import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from scenario_catalog import SCENARIO_CATALOG, read_catalog
 
 # --- CONFIGURATION ---
 IMAGE_FOLDER = "final_showcase"
 OUTPUT_FILE = "Final_Presentation_Board.jpg"
 ROWS = 3
 COLS = 5
-FIG_SIZE = (20, 15) # High resolution size (width, height)
+TILE_SIZE = (384, 560)     # Image area per tile (width, height), ~ the 832x1216 render aspect
+CAPTION_HEIGHT = 110
+TITLE_HEIGHT = 80
+MARGIN = 16
+WORKERS = os.cpu_count() or 4
 
 # --- THE DATA (For captions) ---
-SCENARIOS = [
-    {"name": "Corporate CEO", "prompt": "Caitlyn as a tech CEO giving a keynote speech, modern auditorium, confident smile."},
-    {"name": "Coffee Ad", "prompt": "Caitlyn holding a steaming ceramic coffee cup, cozy sweater, rainy window cafe."},
-    {"name": "Luxury Perfume", "prompt": "Caitlyn in an elegant evening gown, holding a crystal perfume bottle, studio lighting."},
-    {"name": "Fitness Brand", "prompt": "Caitlyn jogging in a modern city park at sunrise, premium athletic wear, dynamic pose."},
-    {"name": "Doctor", "prompt": "Caitlyn dressed as a professional doctor with a stethoscope, white coat, hospital background."},
-    {"name": "Travel Paris", "prompt": "Caitlyn taking a selfie with the Eiffel Tower, golden hour, chic beret and trench coat."},
-    {"name": "Cozy Reading", "prompt": "Caitlyn reading a book in a comfortable armchair, surrounded by plants, library setting."},
-    {"name": "Summer Beach", "prompt": "Caitlyn walking on a white sand beach, wearing a white linen dress, sunny day."},
-    {"name": "Urban Style", "prompt": "Caitlyn leaning against a brick wall in New York, leather jacket, sunglasses, neon."},
-    {"name": "Cooking Chef", "prompt": "Caitlyn in a modern kitchen wearing a chef's apron, preparing a gourmet salad."},
-    {"name": "SciFi Cyberpunk", "prompt": "Caitlyn in a futuristic cyberpunk city, neon rain, high-tech tactical jacket."},
-    {"name": "Fantasy Elf", "prompt": "Caitlyn as an ethereal elf queen in a magical forest, silver tiara, glowing fireflies."},
-    {"name": "Space Explorer", "prompt": "Caitlyn wearing a white space suit inside a spaceship corridor, looking at Earth."},
-    {"name": "Victorian Era", "prompt": "Portrait of Caitlyn in 1890s Victorian era clothing, high collar lace dress, sepia."},
-    {"name": "Abstract Art", "prompt": "Double exposure artistic portrait of Caitlyn combined with a forest landscape."}
-]
-
-def create_grid():
-    # 1. Get Images
-    # Sort ensures 01 matches Scenario 1, 02 matches Scenario 2, etc.
-    image_files = sorted(glob.glob(os.path.join(IMAGE_FOLDER, "*.png")))
-    
-    if not image_files:
-        print("❌ No images found in final_showcase!")
-        return
-
-    print(f"🎨 Creating {ROWS}x{COLS} grid from {len(image_files)} images...")
-
-    # 2. Setup Plot
-    # constrained_layout helps prevent text overlap automatically
-    fig, axes = plt.subplots(ROWS, COLS, figsize=FIG_SIZE, constrained_layout=True)
-    
-    # Flatten axes array for easy looping
-    axes_flat = axes.flatten()
-
-    # 3. Fill the Grid
-    for i, ax in enumerate(axes_flat):
-        if i < len(image_files) and i < len(SCENARIOS):
-            img_path = image_files[i]
-            scenario = SCENARIOS[i]
-            
-            try:
-                # Load and Display Image
-                img = mpimg.imread(img_path)
-                ax.imshow(img)
-                
-                # --- CAPTION STYLING ---
-                # Title (Bold)
-                title = scenario['name']
-                # Prompt (Wrapped, smaller)
-                wrapped_prompt = "\n".join(textwrap.wrap(scenario['prompt'], width=30))
-                
-                label_text = f"{title}\n\n{wrapped_prompt}"
-                
-                # Set text below image (xlabel)
-                ax.set_xlabel(label_text, fontsize=9, labelpad=10, linespacing=1.4)
-                
-                # Clean up borders
-                ax.set_xticks([]) # Remove X ticks
-                ax.set_yticks([]) # Remove Y ticks
-                
-                # Remove the black box outline (spines)
-                for spine in ax.spines.values():
-                    spine.set_visible(False)
-                    
-            except Exception as e:
-                print(f"⚠️ Error reading {img_path}: {e}")
-        else:
-            # Hide unused squares
-            ax.axis('off')
-
-    # 4. Add Main Title
-    fig.suptitle('PROJECT VULCAN: Digital Twin Scenarios', fontsize=20, weight='bold')
-
-    # 5. Save
-    print("💾 Saving high-res image...")
-    # facecolor='white' ensures the background is white, not transparent
-    plt.savefig(OUTPUT_FILE, dpi=200, facecolor='white')
-    print(f"✅ Done! Saved to: {OUTPUT_FILE}")
+# Same catalog the director renders from; a scenario's "id" is the file prefix: 01_Corporate_CEO.png -> 1
+CATALOG = SCENARIO_CATALOG
+
+# NN_Name.png or NN_Name_vKK.png, as written by the director
+FILE_PATTERN = re.compile(r"^(\d+)_.*\.(png|jpe?g|webp)$", re.IGNORECASE)
+VARIANT_PATTERN = re.compile(r"_v(\d+)\.\w+$")
+FORMAT_PREFERENCE = [".png", ".webp", ".jpg", ".jpeg"]
+
+def load_font(size, bold=False):
+    """DejaVu ships with Pillow-friendly distros, Arial with Windows; otherwise Pillow's built-in font."""
+    names = ["DejaVuSans-Bold.ttf", "arialbd.ttf"] if bold else ["DejaVuSans.ttf", "arial.ttf"]
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def find_tiles(folder, scenarios):
+    """(image path, scenario) pairs matched by the file's scenario ID, not by glob position."""
+    by_id = {s['id']: s for s in scenarios}
+    # OUTPUT_FORMATS writes .webp/.jpg copies next to each .png: one tile per render, the master preferred
+    by_stem = {}
+    for filename in os.listdir(folder):
+        if FILE_PATTERN.match(filename):
+            by_stem.setdefault(os.path.splitext(filename)[0], []).append(filename)
+    tiles, unmatched = [], []
+    for stem in sorted(by_stem):
+        filename = min(by_stem[stem], key=lambda f: FORMAT_PREFERENCE.index(os.path.splitext(f)[1].lower()))
+        match = FILE_PATTERN.match(filename)
+        scenario = by_id.get(int(match.group(1)))
+        if scenario is None:
+            unmatched.append(filename)
+            continue
+        tiles.append((os.path.join(folder, filename), scenario))
+    if unmatched:
+        print(f"⚠️ No caption for: {', '.join(unmatched)}")
+    # Scenario order first; variants of one scenario stay together
+    return sorted(tiles, key=lambda t: (t[1]['id'], os.path.basename(t[0])))
+
+def load_tile(path, size):
+    """Decodes an image already shrunk to tile size: JPEG decodes at 1/2-1/8 scale, others are box-reduced first."""
+    with Image.open(path) as img:
+        img.draft("RGB", size)
+        factor = max(1, min(img.width // size[0], img.height // size[1]))
+        img = img.convert("RGB")
+        if factor > 1:
+            img = img.reduce(factor)
+        img.thumbnail(size, Image.LANCZOS)
+        return img
+
+def render_page(tiles, images, rows, cols, page, pages, fonts):
+    title_font, name_font, prompt_font = fonts
+    tile_w, tile_h = TILE_SIZE
+    cell_w, cell_h = tile_w + MARGIN, tile_h + CAPTION_HEIGHT + MARGIN
+    board = Image.new("RGB", (cols * cell_w + MARGIN, TITLE_HEIGHT + rows * cell_h + MARGIN), "white")
+    draw = ImageDraw.Draw(board)
+
+    title = "PROJECT VULCAN: Digital Twin Scenarios" + (f"  ({page}/{pages})" if pages > 1 else "")
+    draw.text((board.width // 2, TITLE_HEIGHT // 2), title, font=title_font, fill="black", anchor="mm")
+
+    wrap = max(10, int(tile_w / (prompt_font.size * 0.55)))
+    for i, ((path, scenario), img) in enumerate(zip(tiles, images)):
+        x = MARGIN + (i % cols) * cell_w
+        y = TITLE_HEIGHT + (i // cols) * cell_h
+        if img is not None:
+            board.paste(img, (x + (tile_w - img.width) // 2, y + (tile_h - img.height) // 2))
+        # --- CAPTION STYLING ---
+        variant = VARIANT_PATTERN.search(os.path.basename(path))
+        name = scenario['name'].replace("_", " ") + (f"  v{variant.group(1)}" if variant else "")
+        draw.text((x + tile_w // 2, y + tile_h + 8), name, font=name_font, fill="black", anchor="ma")
+        prompt = "\n".join(textwrap.wrap(scenario['prompt'], width=wrap)[:4])
+        draw.multiline_text((x + tile_w // 2, y + tile_h + 14 + name_font.size), prompt, font=prompt_font,
+                            fill=(60, 60, 60), anchor="ma", align="center", spacing=3)
+    return board
+
+def page_path(output_file, page):
+    """First page keeps the plain name; later pages get _p2, _p3, ..."""
+    if page == 1:
+        return output_file
+    stem, ext = os.path.splitext(output_file)
+    return f"{stem}_p{page}{ext}"
+
+def create_grid(folder=IMAGE_FOLDER, output_file=OUTPUT_FILE, rows=ROWS, cols=COLS, catalog=CATALOG):
+    start = time.perf_counter()
+    if not os.path.isdir(folder):
+        print(f"❌ No images found in {folder}!")
+        return []
+    tiles = find_tiles(folder, read_catalog(catalog))
+    if not tiles:
+        print(f"❌ No images found in {folder}!")
+        return []
+
+    per_page = rows * cols
+    pages = -(-len(tiles) // per_page)
+    print(f"🎨 Creating {rows}x{cols} grid from {len(tiles)} images ({pages} page(s))...")
+    fonts = (load_font(32, bold=True), load_font(18, bold=True), load_font(13))
+
+    def safe_load(path):
+        try:
+            return load_tile(path, TILE_SIZE)
+        except Exception as e:
+            print(f"⚠️ Error reading {path}: {e}")
+            return None
+
+    saved = []
+    # Pillow releases the GIL while decoding and resampling, so threads decode in parallel
+    with ThreadPoolExecutor(WORKERS) as pool:
+        for p in range(pages):
+            page_tiles = tiles[p * per_page:(p + 1) * per_page]
+            images = list(pool.map(safe_load, [path for path, _ in page_tiles]))
+            board = render_page(page_tiles, images, rows, cols, p + 1, pages, fonts)
+            path = page_path(output_file, p + 1)
+            board.save(path, quality=92)
+            saved.append(path)
+
+    print(f"✅ Done! Saved {', '.join(saved)} in {time.perf_counter() - start:.1f}s")
+    return saved
 
 if __name__ == "__main__":
-    create_grid()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Composites the showcase renders into captioned presentation boards.")
+    parser.add_argument("--folder", default=IMAGE_FOLDER)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--cols", type=int, default=COLS)
+    parser.add_argument("--catalog", default=CATALOG, help="scenario catalog (.jsonl/.csv) holding the captions")
+    args = parser.parse_args()
+    create_grid(args.folder, args.output, args.rows, args.cols, args.catalog)
@@ -1,37 +1,176 @@
+import argparse
+import codecs
+import fnmatch
+import hashlib
+import json
 import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Define the root of your project
 ROOT_DIR = os.getcwd()
 OUTPUT_FILE = "PROJECT_CONTEXT.txt"
+INDEX_FILE = ".harvest_index.json" # budget + path -> mtime, size, hash (or binary/skipped) of every file
 
 # Folders to ignore to keep the context clean
 IGNORE_DIRS = {'.git', '__pycache__', 'data', 'venv', 'node_modules'}
-IGNORE_FILES = {OUTPUT_FILE, '.env', 'package-lock.json'}
+IGNORE_FILES = {OUTPUT_FILE, INDEX_FILE, '.env', 'package-lock.json'}
 
-def harvest_context():
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as outfile:
-        for root, dirs, files in os.walk(ROOT_DIR):
+SNIFF_BYTES = 8192
+MAX_FILE_KB = 512        # Larger text files are listed but not inlined
+BUDGET_KB = 4096         # Total UTF-8 bytes inlined in the output; later files are listed as omitted
+WORKERS = 8
+
+def load_gitignore(root):
+    patterns = []
+    path = os.path.join(root, ".gitignore")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            patterns = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return patterns
+
+def gitignored(relative_path, patterns):
+    """Approximates .gitignore matching (no negations) for trees that are not git checkouts."""
+    parts = relative_path.split('/')
+    for pattern in patterns:
+        if pattern.startswith('!'):
+            continue
+        anchored = pattern.startswith('/')
+        pattern = pattern.strip('/')
+        if anchored or '/' in pattern:
+            # Anchored: match the path itself or any of its parent directories
+            if any(fnmatch.fnmatch('/'.join(parts[:i]), pattern) for i in range(1, len(parts) + 1)):
+                return True
+        elif any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+    return False
+
+def list_files(root):
+    """Tracked and untracked-but-not-ignored files; `git ls-files` when available, else a filtered walk."""
+    try:
+        out = subprocess.run(["git", "ls-files", "-co", "--exclude-standard", "-z"], cwd=root,
+                             capture_output=True, check=True).stdout
+        files = [p for p in out.decode('utf-8', errors='replace').split('\0') if p]
+    except (OSError, subprocess.CalledProcessError):
+        patterns = load_gitignore(root)
+        files = []
+        for dirpath, dirs, names in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            rel_dir = "" if rel_dir == "." else rel_dir + "/"
             # Prune ignored directories
-            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-            
-            for file in files:
-                if file in IGNORE_FILES or file.endswith(('.pyc', '.png', '.jpg', '.parquet')):
-                    continue
-                
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, ROOT_DIR)
-                
-                outfile.write(f"LOCATION: {relative_path}\n")
-                outfile.write("-" * 40 + "\n")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        outfile.write(f.read())
-                except Exception as e:
-                    outfile.write(f"[ERROR READING FILE: {e}]")
-                
-                outfile.write("\n\n" + "="*80 + "\n\n")
-
-    print(f"✅ Success! All code gathered in {OUTPUT_FILE}")
+            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS and not gitignored(rel_dir + d, patterns)]
+            files.extend(rel_dir + n for n in names if not gitignored(rel_dir + n, patterns))
+
+    return sorted(p for p in files
+                  if os.path.basename(p) not in IGNORE_FILES
+                  and not any(part in IGNORE_DIRS for part in p.split('/')[:-1])
+                  and os.path.isfile(os.path.join(root, p)))
+
+def is_binary(head):
+    """NUL bytes or invalid UTF-8 in the first bytes mean binary, whatever the extension says."""
+    if b'\0' in head:
+        return True
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False) # A cut multi-byte char is fine
+        return False
+    except UnicodeDecodeError:
+        return True
+
+def read_entry(root, path, st):
+    """Index entry of one file; the text itself is read again only when the output is written."""
+    entry = {"mtime": st.st_mtime_ns, "size": st.st_size}
+    with open(os.path.join(root, path), 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        if is_binary(head):
+            entry["binary"] = True
+            return entry
+        if st.st_size > MAX_FILE_KB * 1024:
+            entry["skipped"] = "too large"
+            return entry
+        data = head + f.read()
+    entry["hash"] = hashlib.sha1(data).hexdigest()
+    try:
+        data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        entry["skipped"] = f"ERROR READING FILE: {e}"
+    return entry
+
+def same_content(a, b):
+    """Equal apart from mtime: a touched or re-checked-out file whose bytes did not change."""
+    return b is not None and {k: v for k, v in a.items() if k != "mtime"} == {k: v for k, v in b.items() if k != "mtime"}
+
+def save_index(index_path, budget, entries):
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({"budget": budget, "files": entries}, f)
+
+def harvest_context(root=ROOT_DIR, output_file=OUTPUT_FILE, budget_kb=BUDGET_KB, full=False):
+    start = time.perf_counter()
+    index_path = os.path.join(root, INDEX_FILE)
+    index = {}
+    if not full and os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    budget = budget_kb * 1024
+    known = index.get("files", {}) # Indexes of earlier versions (text inlined, no "files") are just rebuilt
+
+    files = list_files(root)
+    entries, changed = {}, []
+    for path in files:
+        st = os.stat(os.path.join(root, path))
+        cached = known.get(path)
+        # Unchanged size and mtime: reuse the indexed entry without opening the file
+        if cached and cached["mtime"] == st.st_mtime_ns and cached["size"] == st.st_size:
+            entries[path] = cached
+        else:
+            changed.append((path, st))
+
+    with ThreadPoolExecutor(WORKERS) as pool:
+        for (path, _), entry in zip(changed, pool.map(lambda item: read_entry(root, *item), changed)):
+            entries[path] = entry
+    modified = [path for path, _ in changed if not same_content(entries[path], known.get(path))]
+
+    if not modified and set(files) == set(known) and index.get("budget") == budget and os.path.exists(output_file):
+        save_index(index_path, budget, entries) # Keep the new mtimes so touched files are not hashed again
+        print(f"✅ {output_file} already up to date ({len(files)} files, {len(changed)} rehashed) "
+              f"in {time.perf_counter() - start:.2f}s")
+        return
+
+    omitted = []
+    tmp = output_file + ".tmp"
+    with open(tmp, 'w', encoding='utf-8', newline='') as outfile:
+        for path in files:
+            entry = entries[path]
+            if entry.get("binary"):
+                continue
+            # The file's size is exactly the UTF-8 bytes that would be inlined
+            if "skipped" not in entry and entry['size'] > budget:
+                omitted.append(path)
+                continue
+
+            outfile.write(f"LOCATION: {path}\n")
+            outfile.write("-" * 40 + "\n")
+            if "skipped" in entry:
+                outfile.write(f"[{entry['skipped'].upper()}: {entry['size']} bytes]")
+            else:
+                with open(os.path.join(root, path), 'r', encoding='utf-8', newline='') as f:
+                    outfile.write(f.read())
+                budget -= entry['size']
+            outfile.write("\n\n" + "="*80 + "\n\n")
+
+        if omitted:
+            outfile.write("OMITTED (size budget reached):\n" + "\n".join(omitted) + "\n")
+    os.replace(tmp, output_file)
+    save_index(index_path, budget_kb * 1024, entries)
+
+    binaries = sum(1 for e in entries.values() if e.get("binary"))
+    print(f"✅ Success! All code gathered in {output_file} "
+          f"({len(files)} files, {len(modified)} changed, {binaries} binary skipped, {len(omitted)} over budget) "
+          f"in {time.perf_counter() - start:.2f}s")
 
 if __name__ == "__main__":
-    harvest_context()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gathers the project's text files into one context file.")
+    parser.add_argument("--budget-kb", type=int, default=BUDGET_KB, help="max text inlined in total")
+    parser.add_argument("--full", action="store_true", help="ignore the index and re-read every file")
+    args = parser.parse_args()
+    harvest_context(budget_kb=args.budget_kb, full=args.full)
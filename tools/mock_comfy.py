@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from aiohttp import web
+
+# ComfyUI binary frame header: event type 1 (PREVIEW_IMAGE), image format 1 (JPEG) or 2 (PNG)
+PREVIEW_IMAGE = 1
+FORMAT_JPEG, FORMAT_PNG = 1, 2
+
+def _node(required, outputs, optional=None):
+    return {"input": {"required": required, "optional": optional or {}}, "output": outputs,
+            "output_name": outputs, "output_node": not outputs}
+
+# /object_info for the nodes the Vulcan workflows use, with the model files the mock "has"
+OBJECT_INFO = {
+    "KSampler": _node({"model": ["MODEL"], "seed": ["INT", {"min": 0, "max": 2**64 - 1}],
+                       "steps": ["INT", {"min": 1, "max": 10000}], "cfg": ["FLOAT", {"min": 0.0, "max": 100.0}],
+                       "sampler_name": [["euler", "euler_ancestral", "dpmpp_2m"]],
+                       "scheduler": [["simple", "normal", "karras"]], "positive": ["CONDITIONING"],
+                       "negative": ["CONDITIONING"], "latent_image": ["LATENT"],
+                       "denoise": ["FLOAT", {"min": 0.0, "max": 1.0}]}, ["LATENT"]),
+    "UnetLoaderGGUF": _node({"unet_name": [["flux1-dev-Q4_K_S.gguf"]]}, ["MODEL"]),
+    "EmptyLatentImage": _node({"width": ["INT", {"min": 16, "max": 16384}], "height": ["INT", {"min": 16, "max": 16384}],
+                               "batch_size": ["INT", {"min": 1, "max": 4096}]}, ["LATENT"]),
+    "CLIPTextEncode": _node({"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]}, ["CONDITIONING"]),
+    "VAEDecode": _node({"samples": ["LATENT"], "vae": ["VAE"]}, ["IMAGE"]),
+    "VAELoader": _node({"vae_name": [["ae.safetensors"]]}, ["VAE"]),
+    "LoraLoader": _node({"model": ["MODEL"], "clip": ["CLIP"], "lora_name": [["caitlyn_lifestyle_v1.safetensors"]],
+                         "strength_model": ["FLOAT", {"min": -100.0, "max": 100.0}],
+                         "strength_clip": ["FLOAT", {"min": -100.0, "max": 100.0}]}, ["MODEL", "CLIP"]),
+    "DualCLIPLoader": _node({"clip_name1": [["clip_l.safetensors", "t5xxl_fp8_e4m3fn.safetensors"]],
+                             "clip_name2": [["clip_l.safetensors", "t5xxl_fp8_e4m3fn.safetensors"]],
+                             "type": [["sdxl", "sd3", "flux"]]}, ["CLIP"],
+                            optional={"device": ["COMBO", {"options": ["default", "cpu"]}]}),
+    "LatentFromBatch": _node({"samples": ["LATENT"], "batch_index": ["INT", {"min": 0, "max": 63}],
+                              "length": ["INT", {"min": 1, "max": 64}]}, ["LATENT"]),
+    "SaveImage": _node({"images": ["IMAGE"], "filename_prefix": ["STRING", {"default": "ComfyUI"}]}, []),
+    "PreviewImage": _node({"images": ["IMAGE"]}, []),
+    "SaveImageWebsocket": _node({"images": ["IMAGE"]}, []),
+}
+
+def make_png(width, height, rgb):
+    """Tiny valid solid-colour PNG (no Pillow needed on the CI box)."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height)) + chunk(b"IEND", b""))
+
+class MockComfy:
+    """Stand-in for a ComfyUI server: one simulated GPU executing the queue in order.
+
+    Implements /prompt, /ws, /history, /view, /queue, /interrupt and /object_info with configurable render
+    latency, progress steps, latent previews, execution failures and connection resets.
+    """
+
+    def __init__(self, port=8188, latency=1.0, steps=20, fail_rate=0.0, reset_rate=0.0,
+                 previews=False, image_scale=8, seed=None, legacy_interrupt=False):
+        self.port = port
+        self.latency = latency
+        self.steps = steps
+        self.fail_rate = fail_rate
+        self.reset_rate = reset_rate
+        self.previews = previews
+        self.image_scale = image_scale # Served images are width/scale x height/scale
+        self.legacy_interrupt = legacy_interrupt # Like older builds: /interrupt ignores prompt_id
+        self.rng = random.Random(seed)
+
+        self.queue = []      # [(number, prompt_id, workflow, client_id)]
+        self.running = None
+        self.history = {}
+        self.images = {}     # filename -> PNG bytes
+        self.sockets = {}    # client_id -> (WebSocketResponse, transport)
+        self.counter = 0
+        self.busy_seconds = 0.0 # Simulated GPU time, to separate render time from orchestration overhead
+        self._interrupt = None
+        self._wake = None
+        self._loop = None
+        self._runner = None
+        self._worker_task = None
+
+    # --- EXECUTION ---
+    async def _send(self, client_id, message):
+        ws, _ = self.sockets.get(client_id, (None, None))
+        if ws is not None and not ws.closed:
+            await ws.send_str(json.dumps(message))
+
+    async def _send_bytes(self, client_id, frame):
+        ws, _ = self.sockets.get(client_id, (None, None))
+        if ws is not None and not ws.closed:
+            await ws.send_bytes(frame)
+
+    async def _worker(self):
+        while True:
+            while not self.queue:
+                self._wake.clear()
+                await self._wake.wait()
+            number, prompt_id, workflow, client_id = self.queue.pop(0)
+            self.running = (number, prompt_id, workflow, client_id)
+            self._interrupt = asyncio.Event()
+            started = time.perf_counter()
+            try:
+                await self._execute(prompt_id, workflow, client_id)
+                # Like ComfyUI's prompt worker: the closing event follows every prompt, failed or interrupted too
+                await self._send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self.running = None
+            if self.rng.random() < self.reset_rate:
+                self._reset_connections()
+
+    async def _execute(self, prompt_id, workflow, client_id):
+        await self._send(client_id, {"type": "execution_start", "data": {"prompt_id": prompt_id}})
+        outputs = {}
+        for node_id in sorted(workflow, key=lambda n: int(n) if n.isdigit() else n):
+            node = workflow[node_id]
+            await self._send(client_id, {"type": "executing", "data": {"node": node_id, "prompt_id": prompt_id}})
+
+            if node['class_type'] == "KSampler":
+                if not await self._sample(prompt_id, node_id, client_id):
+                    await self._send(client_id, {"type": "execution_interrupted",
+                                                 "data": {"prompt_id": prompt_id, "node_id": node_id}})
+                    self.history[prompt_id] = {"prompt": workflow, "outputs": {},
+                                               "status": {"status_str": "error", "completed": False}}
+                    return
+                if self.rng.random() < self.fail_rate:
+                    await self._send(client_id, {"type": "execution_error", "data": {
+                        "prompt_id": prompt_id, "node_id": node_id, "node_type": "KSampler",
+                        "exception_message": "Mock failure: CUDA out of memory"}})
+                    self.history[prompt_id] = {"prompt": workflow, "outputs": {},
+                                               "status": {"status_str": "error", "completed": False}}
+                    return
+
+            elif node['class_type'] in ("SaveImage", "PreviewImage", "SaveImageWebsocket"):
+                pngs = self._render_images(workflow, prompt_id)
+                if node['class_type'] == "SaveImageWebsocket":
+                    for png in pngs:
+                        await self._send_bytes(client_id, struct.pack(">II", PREVIEW_IMAGE, FORMAT_PNG) + png)
+                else:
+                    images = []
+                    for i, png in enumerate(pngs):
+                        filename = f"{node['inputs'].get('filename_prefix', 'ComfyUI')}_{prompt_id[:8]}_{i:05}_.png"
+                        self.images[filename] = png
+                        images.append({"filename": filename, "subfolder": "", "type": "output"})
+                    outputs[node_id] = {"images": images}
+                    await self._send(client_id, {"type": "executed", "data": {
+                        "node": node_id, "output": outputs[node_id], "prompt_id": prompt_id}})
+
+        self.history[prompt_id] = {"prompt": workflow, "outputs": outputs,
+                                   "status": {"status_str": "success", "completed": True}}
+        await self._send(client_id, {"type": "execution_success", "data": {"prompt_id": prompt_id}})
+
+    async def _sample(self, prompt_id, node_id, client_id):
+        """Spends the configured render latency, emitting progress (and previews); False if interrupted."""
+        steps = max(1, self.steps)
+        for step in range(steps):
+            try:
+                await asyncio.wait_for(self._interrupt.wait(), self.latency / steps)
+                return False
+            except asyncio.TimeoutError:
+                pass
+            await self._send(client_id, {"type": "progress", "data": {
+                "value": step + 1, "max": steps, "prompt_id": prompt_id, "node": node_id}})
+            if self.previews:
+                shade = int(255 * (step + 1) / steps)
+                await self._send_bytes(client_id, struct.pack(">II", PREVIEW_IMAGE, FORMAT_PNG)
+                                       + make_png(16, 16, (shade, shade, shade)))
+        return True
+
+    def _render_images(self, workflow, prompt_id):
+        width, height, batch = 832, 1216, 1
+        for node in workflow.values():
+            if node['class_type'] == "EmptyLatentImage":
+                width, height = node['inputs']['width'], node['inputs']['height']
+                batch = node['inputs'].get('batch_size', 1)
+        rgb = tuple(uuid.UUID(prompt_id).bytes[:3])
+        png = make_png(max(1, width // self.image_scale), max(1, height // self.image_scale), rgb)
+        return [png] * batch
+
+    def _reset_connections(self):
+        """Drops every WebSocket with a TCP RST, like the WSL2 bridge does (errno 104 on the client)."""
+        for ws, transport in list(self.sockets.values()):
+            if transport is None:
+                continue
+            sock = transport.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            transport.abort()
+        self.sockets.clear()
+
+    # --- HTTP API ---
+    async def post_prompt(self, request):
+        body = await request.json()
+        # Like ComfyUI's validation: a prompt with an unknown node type never reaches the queue
+        node_errors = {node_id: {"errors": [{"type": "invalid_prompt", "message": f"Cannot execute because node {node['class_type']} does not exist."}],
+                                 "class_type": node['class_type']}
+                       for node_id, node in body['prompt'].items() if node['class_type'] not in OBJECT_INFO}
+        if node_errors:
+            return web.json_response({"error": {"type": "invalid_prompt", "message": "Prompt outputs failed validation"},
+                                      "node_errors": node_errors}, status=400)
+        prompt_id = str(uuid.uuid4())
+        self.counter += 1
+        self.queue.append((self.counter, prompt_id, body['prompt'], body.get('client_id')))
+        self._wake.set()
+        return web.json_response({"prompt_id": prompt_id, "number": self.counter, "node_errors": {}})
+
+    async def get_history(self, request):
+        prompt_id = request.match_info.get('prompt_id')
+        if prompt_id is None:
+            return web.json_response(self.history)
+        return web.json_response({prompt_id: self.history[prompt_id]} if prompt_id in self.history else {})
+
+    async def get_view(self, request):
+        png = self.images.get(request.query.get('filename'))
+        if png is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=png, content_type="image/png")
+
+    async def get_queue(self, request):
+        running = [list(self.running[:3])] if self.running else []
+        return web.json_response({"queue_running": running, "queue_pending": [list(q[:3]) for q in self.queue]})
+
+    async def post_queue(self, request):
+        body = await request.json()
+        if body.get('clear'):
+            self.queue.clear()
+        delete = set(body.get('delete', []))
+        self.queue = [q for q in self.queue if q[1] not in delete]
+        return web.json_response({})
+
+    async def get_object_info(self, request):
+        return web.json_response(OBJECT_INFO)
+
+    async def post_interrupt(self, request):
+        body = await request.json() if request.can_read_body else {}
+        target = None if self.legacy_interrupt else body.get('prompt_id')
+        if self.running and self._interrupt is not None and target in (None, self.running[1]):
+            self._interrupt.set()
+        return web.json_response({})
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        client_id = request.query.get('clientId') or uuid.uuid4().hex
+        self.sockets[client_id] = (ws, request.transport)
+        await ws.send_str(json.dumps({"type": "status", "data": {
+            "status": {"exec_info": {"queue_remaining": len(self.queue)}}, "sid": client_id}}))
+        async for _ in ws:
+            pass
+        if self.sockets.get(client_id, (None,))[0] is ws:
+            del self.sockets[client_id]
+        return ws
+
+    # --- LIFECYCLE ---
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.add_routes([
+            web.post("/prompt", self.post_prompt),
+            web.get("/history", self.get_history),
+            web.get("/history/{prompt_id}", self.get_history),
+            web.get("/view", self.get_view),
+            web.get("/queue", self.get_queue),
+            web.post("/queue", self.post_queue),
+            web.post("/interrupt", self.post_interrupt),
+            web.get("/object_info", self.get_object_info),
+            web.get("/ws", self.websocket),
+        ])
+        return app
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+        self._worker_task = asyncio.get_running_loop().create_task(self._worker())
+
+    def start_in_thread(self):
+        """Runs the server on its own event loop thread; returns once it accepts connections."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self
+
+    async def shutdown(self):
+        self._worker_task.cancel()
+        await self._runner.cleanup()
+
+    def stop(self):
+        loop, self._loop = self._loop, None # A second stop() is a no-op instead of waiting on a dead loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.port}"
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock ComfyUI server for GPU-less testing of the directors.")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds of simulated GPU time per render")
+    parser.add_argument("--steps", type=int, default=20, help="progress events per render")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of an execution_error")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="probability of resetting all sockets after a job")
+    parser.add_argument("--previews", action="store_true", help="send binary latent previews while sampling")
+    parser.add_argument("--legacy-interrupt", action="store_true", help="/interrupt stops whatever runs, ignoring prompt_id")
+    args = parser.parse_args()
+
+    mock = MockComfy(args.port, args.latency, args.steps, args.fail_rate, args.reset_rate, args.previews,
+                     legacy_interrupt=args.legacy_interrupt)
+    print(f"🧪 Mock ComfyUI listening on http://{mock.address} ({args.latency}s/render)")
+
+    async def serve():
+        await mock.start()
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n👋 Mock stopped.")
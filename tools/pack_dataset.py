@@ -0,0 +1,230 @@
+import argparse
+import io
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from phash_index import list_images
+from rapport_img import load_resized, read_size
+
+# --- CONFIGURATION ---
+PACK_DIR = "dataset_pack"
+MANIFEST = "manifest.jsonl"   # One line per image: source, bucket, shard, byte range, caption
+BUCKET_AREA = 1024 * 1024     # Pixels per training image; every bucket stays at or under this area
+BUCKET_STEP = 64              # Bucket sides are multiples of this (latent-friendly)
+MAX_RATIO = 2.0               # Most elongated bucket, width/height or height/width
+SHARD_SIZE = 256              # Images per shard
+PACK_FORMAT = "jpeg"          # jpeg (fastest to decode), webp (smallest) or png (lossless)
+PACK_QUALITY = 95
+WORKERS = os.cpu_count() or 4
+
+PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+SHARD_PATTERN = re.compile(r"^\d+x\d+_\d{4}\.(bin|npy)$") # .npy: raw-pixel shards of earlier versions
+
+def make_buckets(area=BUCKET_AREA, step=BUCKET_STEP, max_ratio=MAX_RATIO):
+    """Portrait and landscape multiple-of-step sizes under the area budget; the largest one per aspect ratio."""
+    largest = {}
+    for w in range(step, int(math.sqrt(area)) + 1, step):
+        h = min(area // w // step * step, int(w * max_ratio) // step * step)
+        for bucket in ((w, h), (h, w)):
+            ratio = round(bucket[0] / bucket[1], 6)
+            if ratio not in largest or bucket[0] * bucket[1] > largest[ratio][0] * largest[ratio][1]:
+                largest[ratio] = bucket
+    return sorted(largest.values())
+
+def nearest_bucket(size, buckets):
+    """Bucket with the closest aspect ratio (compared in log space, so 2:1 and 1:2 are equally far from 1:1)."""
+    ratio = math.log(size[0] / size[1])
+    return min(buckets, key=lambda b: abs(math.log(b[0] / b[1]) - ratio))
+
+def cover_crop(path, size, bucket):
+    """Decodes once at the smallest size covering the bucket, then centre-crops to it."""
+    scale = max(bucket[0] / size[0], bucket[1] / size[1])
+    cover = (max(bucket[0], math.ceil(size[0] * scale)), max(bucket[1], math.ceil(size[1] * scale)))
+    img = load_resized(path, cover)
+    left, top = (cover[0] - bucket[0]) // 2, (cover[1] - bucket[1]) // 2
+    return img.crop((left, top, left + bucket[0], top + bucket[1]))
+
+def encode(img, fmt=PACK_FORMAT, quality=PACK_QUALITY):
+    buffer = io.BytesIO()
+    if fmt == "png":
+        img.save(buffer, "PNG", compress_level=6)
+    else:
+        img.save(buffer, PIL_FORMATS[fmt], quality=quality)
+    return buffer.getvalue()
+
+def _process(item):
+    path, size, bucket, fmt, quality = item
+    try:
+        return encode(cover_crop(path, size, bucket), fmt, quality)
+    except Exception as e:
+        print(f"⚠️ Cannot decode {path}: {e}")
+        return None
+
+def bounded_map(pool, fn, items, window):
+    """Like pool.map, but never more than `window` results wait in memory ahead of the consumer."""
+    items = iter(items)
+    pending = deque(pool.submit(fn, item) for _, item in zip(range(window), items))
+    while pending:
+        result = pending.popleft().result()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            break
+        yield result
+
+def read_caption(path):
+    """kohya-style <stem>.txt first, else the prompt from the Director's <stem>.json sidecar."""
+    stem = os.path.splitext(path)[0]
+    if os.path.exists(stem + ".txt"):
+        with open(stem + ".txt", "r", encoding="utf-8") as f:
+            return f.read().strip()
+    if os.path.exists(stem + ".json"):
+        try:
+            with open(stem + ".json", "r", encoding="utf-8") as f:
+                return json.load(f).get("prompt") or ""
+        except (ValueError, AttributeError):
+            pass
+    return ""
+
+def shard_name(bucket, number):
+    return f"{bucket[0]}x{bucket[1]}_{number:04}.bin"
+
+def load_manifest(pack_dir):
+    path = os.path.join(pack_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def read_image(pack_dir, entry, shards=None):
+    """Encoded bytes of one manifest entry, sliced from its memory-mapped shard (decode with PIL)."""
+    shards = {} if shards is None else shards
+    if entry['shard'] not in shards:
+        shards[entry['shard']] = np.memmap(os.path.join(pack_dir, entry['shard']), dtype=np.uint8, mode="r")
+    return shards[entry['shard']][entry['offset']:entry['offset'] + entry['length']].tobytes()
+
+def pack_dataset(folder, pack_dir=PACK_DIR, area=BUCKET_AREA, shard_size=SHARD_SIZE, workers=WORKERS,
+                 full=False, fmt=PACK_FORMAT, quality=PACK_QUALITY):
+    """Buckets, crops and shards `folder` into `pack_dir`; unchanged images are never decoded again.
+
+    Shards are encoded images back to back; the manifest gives each one's byte range. A shard is
+    rewritten only if one of its images changed or disappeared, or to top up the last, partial
+    shard of a bucket; its surviving images are copied byte for byte, not re-encoded.
+    """
+    start = time.perf_counter()
+    os.makedirs(pack_dir, exist_ok=True)
+    buckets = make_buckets(area)
+    old = [] if full else load_manifest(pack_dir)
+    # Another --area, --format or --quality (or a raw-pixel manifest) invalidates the old entries
+    old = [e for e in old if tuple(e['bucket']) in buckets and e.get('format') == fmt and e.get('quality') == quality]
+
+    paths = list_images(folder)
+    stats = {os.path.basename(p): os.stat(p) for p in paths}
+    valid = {e['file'] for e in old
+             if e['file'] in stats and (e['mtime'], e['size']) == (stats[e['file']].st_mtime_ns, stats[e['file']].st_size)}
+
+    # Shards stay as they are only while every image in them is still current
+    by_shard = {}
+    for e in old:
+        by_shard.setdefault(e['shard'], []).append(e)
+    intact = {s for s, rows in by_shard.items() if all(e['file'] in valid for e in rows)}
+    new_paths = [p for p in paths if os.path.basename(p) not in valid]
+    on_disk = {name for name in os.listdir(pack_dir) if SHARD_PATTERN.match(name)}
+
+    with ProcessPoolExecutor(workers) as pool:
+        # 1. Headers only, to sort the new images into buckets
+        chunk = max(1, len(new_paths) // (workers * 8))
+        sized = [(p, size) for p, size in pool.map(read_size, new_paths, chunksize=chunk) if size]
+        pending = {}
+        for p, size in sized:
+            pending.setdefault(nearest_bucket(size, buckets), []).append((p, size))
+
+        # Top up the last partial shard of a bucket that receives new images
+        for bucket in pending:
+            shards = sorted(s for s in intact if by_shard[s][0]['bucket'] == list(bucket))
+            if shards and len(by_shard[shards[-1]]) < shard_size:
+                intact.discard(shards[-1])
+
+        carried = {} # bucket -> survivors of rewritten shards, copied from their old shard
+        for shard, rows in by_shard.items():
+            if shard not in intact:
+                for e in rows:
+                    if e['file'] in valid:
+                        carried.setdefault(tuple(e['bucket']), []).append(e)
+
+        # 2. One decode + resize + crop + encode per new image, appended to the bucket's shards
+        entries = [e for e in old if e['shard'] in intact]
+        used = {e['shard'] for e in entries}
+        sources = {} # Old shards that images are carried over from, memory-mapped once each
+        decoded = 0
+        for bucket in sorted(set(pending) | set(carried)):
+            items = [("old", e) for e in carried.get(bucket, [])] + [("new", p) for p, _ in pending.get(bucket, [])]
+            results = bounded_map(pool, _process, [(p, size, bucket, fmt, quality) for p, size in pending.get(bucket, [])],
+                                  window=workers * 4)
+            number = 0
+            for offset in range(0, len(items), shard_size):
+                while shard_name(bucket, number) in used or shard_name(bucket, number) in on_disk:
+                    number += 1 # Never overwrite a shard that survivors are still copied from
+                name = shard_name(bucket, number)
+                used.add(name)
+                tmp = os.path.join(pack_dir, name + ".tmp")
+                rows = []
+                with open(tmp, "wb") as f:
+                    for kind, item in items[offset:offset + shard_size]:
+                        if kind == "old":
+                            data, file = read_image(pack_dir, item, sources), item['file']
+                        else:
+                            data, file = next(results), os.path.basename(item)
+                            if data is None:
+                                continue
+                            decoded += 1
+                        st = stats[file]
+                        rows.append({"file": file, "mtime": st.st_mtime_ns, "size": st.st_size,
+                                     "bucket": list(bucket), "format": fmt, "quality": quality,
+                                     "shard": name, "offset": f.tell(), "length": len(data)})
+                        f.write(data)
+                os.replace(tmp, os.path.join(pack_dir, name))
+                entries.extend(rows)
+        sources.clear()
+
+    # 3. Drop every shard nothing points at any more, whatever area or format wrote it
+    for name in on_disk - used:
+        os.remove(os.path.join(pack_dir, name))
+
+    # Captions are cheap to reread, so edits to .txt files are picked up without touching the pixels
+    entries.sort(key=lambda e: (e['shard'], e['offset']))
+    tmp = os.path.join(pack_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for e in entries:
+            e['caption'] = read_caption(os.path.join(folder, e['file']))
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    os.replace(tmp, os.path.join(pack_dir, MANIFEST))
+
+    counts = {}
+    for e in entries:
+        counts[tuple(e['bucket'])] = counts.get(tuple(e['bucket']), 0) + 1
+    for bucket, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+        print(f"  🪣 {bucket[0]}x{bucket[1]}: {count}")
+    packed = sum(os.path.getsize(os.path.join(pack_dir, name)) for name in used)
+    print(f"📦 {len(entries)} images in {len(used)} shards, {packed / 1e6:.1f} MB "
+          f"({decoded} decoded, {len(entries) - decoded} reused) -> {pack_dir} in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packs an image folder into aspect-ratio buckets of memory-mappable shards.")
+    parser.add_argument("folder", help="dataset album folder")
+    parser.add_argument("--out", default=PACK_DIR)
+    parser.add_argument("--area", type=int, default=BUCKET_AREA, help="pixels per training image, e.g. 262144 for 512x512")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="images per shard")
+    parser.add_argument("--format", choices=PIL_FORMATS, default=PACK_FORMAT)
+    parser.add_argument("--quality", type=int, default=PACK_QUALITY, help="jpeg/webp quality")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and repack every image")
+    args = parser.parse_args()
+    pack_dataset(args.folder, args.out, args.area, args.shard_size, args.workers, args.full, args.format, args.quality)
@@ -0,0 +1,223 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# --- CONFIGURATION ---
+INDEX_FILE = ".phash_index.npz"   # Stored next to the images; rebuilt only for new or changed files
+EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+SIDECARS = (".json", ".txt")       # Metadata and captions that follow their image to _duplicates/
+HASHES = ("ahash", "dhash", "phash")
+THRESHOLD = 6                      # Max differing bits (of 64) for two images to count as near-duplicates
+BLOCK = 512                        # Rows per block of the pairwise distance scan
+WORKERS = os.cpu_count() or 4
+
+def _dct_matrix(n=32):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+DCT = _dct_matrix()
+
+def load_gray(path):
+    """32x32 and 9x8 grayscale thumbnails; JPEGs are decoded at reduced scale."""
+    with Image.open(path) as img:
+        img.draft("L", (64, 64))
+        gray = img.convert("L")
+        return (np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float32),
+                np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.float32))
+
+def pack(bits):
+    """(N, 8, 8) booleans -> (N,) uint64."""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view(">u8").ravel().astype(np.uint64)
+
+def compute_hashes(small, tiny):
+    """All three hashes for a batch at once: small is (N, 32, 32), tiny is (N, 8, 9)."""
+    mean8 = small.reshape(-1, 8, 4, 8, 4).mean(axis=(2, 4))
+    ahash = pack(mean8 > mean8.mean(axis=(1, 2), keepdims=True))
+    dhash = pack(tiny[:, :, 1:] > tiny[:, :, :-1])
+    low = (DCT @ small @ DCT.T)[:, :8, :8] # Lowest frequencies
+    median = np.median(low.reshape(len(low), 64)[:, 1:], axis=1)[:, None, None] # DC term excluded
+    phash = pack(low > median)
+    return {"ahash": ahash, "dhash": dhash, "phash": phash}
+
+def list_images(folder):
+    return sorted(p for p in glob.glob(os.path.join(folder, "*")) if p.lower().endswith(EXTENSIONS))
+
+def build_index(folder, workers=WORKERS):
+    """Hashes every image in `folder`, reusing the stored hashes of files whose mtime and size are unchanged."""
+    index_path = os.path.join(folder, INDEX_FILE)
+    old = {}
+    if os.path.exists(index_path):
+        with np.load(index_path) as data:
+            for i, name in enumerate(data["names"]):
+                old[str(name)] = (int(data["mtime"][i]), int(data["size"][i]), [int(data[h][i]) for h in HASHES])
+
+    paths = list_images(folder)
+    names = [os.path.basename(p) for p in paths]
+    stats = [os.stat(p) for p in paths]
+    hashes = {h: np.zeros(len(paths), dtype=np.uint64) for h in HASHES}
+    todo = []
+    for i, (name, st) in enumerate(zip(names, stats)):
+        cached = old.get(name)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            for h, value in zip(HASHES, cached[2]):
+                hashes[h][i] = value
+        else:
+            todo.append(i)
+
+    keep = np.ones(len(paths), dtype=bool)
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, len(todo), BLOCK):
+            batch = todo[start:start + BLOCK]
+            loaded = list(pool.map(_safe_load, [paths[i] for i in batch]))
+            ok = [(i, img) for i, img in zip(batch, loaded) if img is not None]
+            for i, img in zip(batch, loaded):
+                if img is None:
+                    keep[i] = False
+            if not ok:
+                continue
+            rows = [i for i, _ in ok]
+            batch_hashes = compute_hashes(np.stack([img[0] for _, img in ok]), np.stack([img[1] for _, img in ok]))
+            for h in HASHES:
+                hashes[h][rows] = batch_hashes[h]
+
+    index = {"names": np.array(names)[keep],
+             "mtime": np.array([st.st_mtime_ns for st in stats], dtype=np.int64)[keep],
+             "size": np.array([st.st_size for st in stats], dtype=np.int64)[keep],
+             **{h: hashes[h][keep] for h in HASHES}}
+    np.savez(index_path, **index)
+    print(f"🔢 {len(index['names'])} images indexed ({len(todo)} hashed, {len(paths) - len(todo)} reused)")
+    return index
+
+def _safe_load(path):
+    try:
+        return load_gray(path)
+    except Exception as e:
+        print(f"⚠️ Cannot read {path}: {e}")
+        return None
+
+def hamming(value, hashes):
+    return np.bitwise_count(np.bitwise_xor(hashes, np.uint64(value)))
+
+def near_pairs(hashes, threshold):
+    """(i, j) pairs with i < j within `threshold` bits, scanned block by block to bound memory."""
+    pairs = []
+    for start in range(0, len(hashes), BLOCK):
+        block = hashes[start:start + BLOCK]
+        dist = np.bitwise_count(np.bitwise_xor(block[:, None], hashes[None, :]))
+        rows, cols = np.nonzero(dist <= threshold)
+        rows += start
+        upper = cols > rows
+        pairs.extend(zip(rows[upper].tolist(), cols[upper].tolist()))
+    return pairs
+
+def clusters(hashes, threshold):
+    """Groups of near-duplicates (union-find over the near pairs), largest first."""
+    parent = list(range(len(hashes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in near_pairs(hashes, threshold):
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+def pick_keeper(folder, names, group):
+    """Keeps the largest image of a group, the lossless .png master at equal size, then the first by name."""
+    def rank(i):
+        with Image.open(os.path.join(folder, names[i])) as img:
+            pixels = img.width * img.height
+        return pixels, names[i].lower().endswith(".png"), -i
+    return max(group, key=rank)
+
+def resolve(folder, names, hashes, group, threshold):
+    """(keeper, duplicates) for each part of a union-find group.
+
+    Union-find chains small steps (A~B, B~C) even when A and C are far apart, so a member only
+    counts as a duplicate within `threshold` of its keeper; the rest form their own groups.
+    """
+    remaining = list(group)
+    while len(remaining) > 1:
+        keeper = pick_keeper(folder, names, remaining)
+        close = hamming(hashes[keeper], hashes[remaining]) <= threshold
+        dupes = [i for i, near in zip(remaining, close) if near and i != keeper]
+        if dupes:
+            yield keeper, dupes
+        remaining = [i for i, near in zip(remaining, close) if not near]
+
+def move_duplicates(folder, duplicates, kept):
+    """Moves duplicates to <folder>/_duplicates with their sidecars and thumbnail.
+
+    An OUTPUT_FORMATS copy shares its stem with the kept .png; the sidecars then stay with the keeper.
+    """
+    target = os.path.join(folder, "_duplicates")
+    os.makedirs(target, exist_ok=True)
+    kept_stems = {os.path.splitext(name)[0] for name in kept}
+    for name in duplicates:
+        shutil.move(os.path.join(folder, name), os.path.join(target, name))
+        stem = os.path.splitext(name)[0]
+        if stem in kept_stems:
+            continue
+        companions = [stem + ext for ext in SIDECARS] + [os.path.join("thumbs", stem + ".jpg")]
+        for companion in companions:
+            if os.path.exists(os.path.join(folder, companion)):
+                os.makedirs(os.path.dirname(os.path.join(target, companion)), exist_ok=True)
+                shutil.move(os.path.join(folder, companion), os.path.join(target, companion))
+    return target
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perceptual-hash index of an image folder: find, flag or prune near-duplicates.")
+    parser.add_argument("folder", help="dataset folder or final_showcase")
+    parser.add_argument("--hash", choices=HASHES, default="phash")
+    parser.add_argument("--threshold", type=int, default=THRESHOLD, help="max differing bits out of 64")
+    parser.add_argument("--query", help="list the indexed images close to this image")
+    parser.add_argument("--report", help="write the duplicate clusters to this JSON file")
+    parser.add_argument("--prune", action="store_true", help="move all but one image of each cluster to <folder>/_duplicates")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.folder)
+    names, hashes = [str(n) for n in index["names"]], index[args.hash]
+
+    if args.query:
+        small, tiny = load_gray(args.query)
+        value = compute_hashes(small[None], tiny[None])[args.hash][0]
+        dist = hamming(value, hashes)
+        for i in np.argsort(dist, kind="stable"):
+            if dist[i] > args.threshold:
+                break
+            print(f"  {dist[i]:>2} bits  {names[i]}")
+    else:
+        groups = [part for group in clusters(hashes, args.threshold)
+                  for part in resolve(args.folder, names, hashes, group, args.threshold)]
+        duplicates = []
+        report = []
+        for keeper, group in groups:
+            dupes = [names[i] for i in group]
+            duplicates.extend(dupes)
+            report.append({"keep": names[keeper], "duplicates": dupes})
+            print(f"🔁 {names[keeper]}  ~  {', '.join(dupes)}")
+        print(f"📊 {len(groups)} clusters, {len(duplicates)} near-duplicates of {len(names)} images "
+              f"({args.hash}, <= {args.threshold} bits) in {time.perf_counter() - start:.2f}s")
+
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if args.prune and duplicates:
+            moved = set(duplicates)
+            target = move_duplicates(args.folder, duplicates, [n for n in names if n not in moved])
+            print(f"🧹 Moved {len(duplicates)} duplicates to {target}")
+            build_index(args.folder) # Drop the moved files from the index
@@ -1,5 +1,9 @@
 import os
 import glob
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageOps
 
 # --- CONFIGURATION ---
@@ -15,9 +19,33 @@ TARGET_WIDTH = 3000
 
 # Espace entre les images (padding) en pixels
 PADDING = 20
+
+# "classique" charge tout en mémoire, "streaming" garde la mémoire constante,
+# "auto" passe en streaming au-delà de STREAMING_MIN_IMAGES images
+MODE = "auto"
+STREAMING_MIN_IMAGES = 200
+
+# Streaming : threads de décodage, lignes préparées à l'avance, hauteur max d'une page JPEG
+WORKERS = os.cpu_count() or 4
+PREFETCH_ROWS = 2
+PAGE_HEIGHT = 6000
 # ---------------------
 
 
+def layout_row(sizes, target_width, padding):
+    """Hauteur commune et largeurs d'une ligne pour qu'elle remplisse exactement la largeur cible."""
+    # Calculer la largeur disponible pour les images (largeur totale - les espaces)
+    available_width = target_width - (padding * (len(sizes) + 1))
+
+    # Somme des ratios d'aspect (largeur / hauteur) de la ligne
+    # Cela permet de trouver la hauteur commune idéale
+    aspect_ratio_sum = sum([w / h for w, h in sizes])
+
+    # Hauteur idéale pour que cette ligne remplisse exactement la largeur disponible
+    row_height = int(available_width / aspect_ratio_sum)
+    return row_height, [int(w * (row_height / h)) for w, h in sizes]
+
+
 def create_smart_collage(image_paths, output_path, imgs_per_row, target_width, padding):
     """Crée un collage intelligent en respectant les ratios."""
     
@@ -51,22 +79,13 @@ def create_smart_collage(image_paths, output_path, imgs_per_row, target_width, p
 
     # 3. Traiter chaque ligne
     for row_imgs in rows:
-        # Calculer la largeur disponible pour les images (largeur totale - les espaces)
-        available_width = target_width - (padding * (len(row_imgs) + 1))
-        
-        # Somme des ratios d'aspect (largeur / hauteur) de la ligne
-        # Cela permet de trouver la hauteur commune idéale
-        aspect_ratio_sum = sum([img.width / img.height for img in row_imgs])
-        
-        # Hauteur idéale pour que cette ligne remplisse exactement la largeur disponible
-        row_height = int(available_width / aspect_ratio_sum)
+        row_height, widths = layout_row([img.size for img in row_imgs], target_width, padding)
         
         resized_imgs_in_row = []
         current_row_width = 0
         
         # Redimensionner chaque image de la ligne à cette nouvelle hauteur
-        for img in row_imgs:
-            new_width = int(img.width * (row_height / img.height))
+        for img, new_width in zip(row_imgs, widths):
             resized_img = img.resize((new_width, row_height), Image.Resampling.LANCZOS)
             resized_imgs_in_row.append(resized_img)
             current_row_width += new_width
@@ -106,6 +125,156 @@ def create_smart_collage(image_paths, output_path, imgs_per_row, target_width, p
     print(f"✅ Succès ! Album sauvegardé sous : {output_path}")
 
 
+class PngBandWriter:
+    """Écrit un PNG bande par bande : IHDR d'abord, puis des chunks IDAT compressés au fil de l'eau."""
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path, width, height):
+        self.f = open(path, "wb")
+        self.width, self.height = width, height
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(6)
+        self.pending = b""
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack(">I", len(data)) + tag + data)
+        self.f.write(struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    def write_band(self, band):
+        raw = band.tobytes()
+        stride = self.width * 3
+        # Chaque ligne de pixels commence par son octet de filtre (0 = aucun)
+        scanlines = b"".join(b"\x00" + raw[y * stride:(y + 1) * stride] for y in range(band.height))
+        self.pending += self.compressor.compress(scanlines)
+        while len(self.pending) >= self.CHUNK_SIZE:
+            self._chunk(b"IDAT", self.pending[:self.CHUNK_SIZE])
+            self.pending = self.pending[self.CHUNK_SIZE:]
+        self.rows_written += band.height
+
+    def close(self):
+        assert self.rows_written == self.height, f"{self.rows_written} lignes écrites sur {self.height}"
+        self._chunk(b"IDAT", self.pending + self.compressor.flush())
+        self._chunk(b"IEND", b"")
+        self.f.close()
+
+
+class JpegPageWriter:
+    """Assemble les bandes en pages JPEG d'au plus PAGE_HEIGHT px : album_001.jpg, album_002.jpg..."""
+
+    def __init__(self, path, width, page_height):
+        self.stem, self.ext = os.path.splitext(path)
+        self.width, self.page_height = width, page_height
+        self.bands, self.height = [], 0
+        self.pages = []
+
+    def write_band(self, band):
+        if self.bands and self.height + band.height > self.page_height:
+            self._flush()
+        self.bands.append(band)
+        self.height += band.height
+
+    def _flush(self):
+        page = Image.new('RGB', (self.width, self.height), 'white')
+        y = 0
+        for band in self.bands:
+            page.paste(band, (0, y))
+            y += band.height
+        path = f"{self.stem}_{len(self.pages) + 1:03}{self.ext}"
+        page.save(path, quality=95)
+        self.pages.append(path)
+        self.bands, self.height = [], 0
+
+    def close(self):
+        if self.bands:
+            self._flush()
+
+
+def read_size(path):
+    """Lit uniquement l'en-tête : aucune donnée de pixel n'est décodée."""
+    try:
+        with Image.open(path) as img:
+            return path, img.size
+    except Exception as e:
+        print(f"⚠️ Impossible de lire {path}: {e}")
+        return path, None
+
+
+def load_resized(path, size):
+    """Décode directement à taille réduite (draft JPEG 1/2 à 1/8, réduction entière sinon), puis LANCZOS."""
+    with Image.open(path) as img:
+        img.draft('RGB', size)
+        factor = max(1, min(img.width // size[0], img.height // size[1]))
+        img = img.convert('RGB')
+        if factor > 1:
+            img = img.reduce(factor)
+        return img.resize(size, Image.Resampling.LANCZOS)
+
+
+def create_streaming_collage(image_paths, output_path, imgs_per_row, target_width, padding,
+                             workers=WORKERS, page_height=PAGE_HEIGHT):
+    """Même mise en page que create_smart_collage, mais la mémoire reste constante quelle que soit la taille de l'album.
+
+    Seules les tailles (en-têtes) sont lues pour la mise en page ; chaque ligne est décodée juste
+    avant d'être écrite. Sortie .png : un seul PNG écrit en flux. Autre extension : pages JPEG.
+    """
+    with ThreadPoolExecutor(workers) as pool:
+        # 1. Mise en page à partir des en-têtes seulement
+        print(f"📂 Lecture des en-têtes de {len(image_paths)} images...")
+        sized = [(p, size) for p, size in pool.map(read_size, image_paths) if size]
+        if not sized:
+            print("❌ Aucune image valide trouvée.")
+            return
+
+        rows = []
+        for i in range(0, len(sized), imgs_per_row):
+            chunk = sized[i:i + imgs_per_row]
+            row_height, widths = layout_row([size for _, size in chunk], target_width, padding)
+            rows.append(([p for p, _ in chunk], widths, row_height))
+        total_height = sum(h + padding for _, _, h in rows) + padding
+        print(f"📐 {len(rows)} lignes, image finale {target_width}x{total_height} px (streaming)")
+
+        if output_path.lower().endswith(".png"):
+            writer = PngBandWriter(output_path, target_width, total_height)
+        else:
+            writer = JpegPageWriter(output_path, target_width, page_height)
+
+        # 2. Décodage en parallèle, quelques lignes d'avance seulement
+        def submit(row):
+            paths, widths, row_height = row
+            return [pool.submit(load_resized, p, (w, row_height)) for p, w in zip(paths, widths)], row
+
+        row_iter = iter(rows)
+        pending = deque(submit(row) for _, row in zip(range(PREFETCH_ROWS + 1), row_iter))
+
+        # 3. Chaque bande = padding du haut + la ligne ; la dernière porte aussi le padding du bas
+        for index in range(len(rows)):
+            futures, (paths, widths, row_height) = pending.popleft()
+            next_row = next(row_iter, None)
+            if next_row is not None:
+                pending.append(submit(next_row))
+
+            bottom = padding if index == len(rows) - 1 else 0
+            band = Image.new('RGB', (target_width, padding + row_height + bottom), 'white')
+            # Centrer la ligne horizontalement si elle est un peu moins large que le target
+            row_content_width = sum(widths) + (padding * (len(widths) - 1))
+            current_x = (target_width - row_content_width) // 2
+            for future, path, width in zip(futures, paths, widths):
+                try:
+                    band.paste(future.result(), (current_x, padding))
+                except Exception as e:
+                    print(f"⚠️ Impossible de décoder {path}: {e}")
+                current_x += width + padding
+            writer.write_band(band)
+
+        writer.close()
+
+    pages = getattr(writer, 'pages', None)
+    print(f"✅ Succès ! Album sauvegardé sous : {', '.join(pages) if pages else output_path}")
+
+
 # --- Exécution ---
 if __name__ == "__main__":
     # Vérifier le chemin
@@ -127,4 +296,7 @@ if __name__ == "__main__":
         exit()
         
     # Lancer la création
-    create_smart_collage(image_files, OUTPUT_FILE, IMAGES_PER_ROW, TARGET_WIDTH, PADDING)
\ No newline at end of file
+    if MODE == "streaming" or (MODE == "auto" and len(image_files) > STREAMING_MIN_IMAGES):
+        create_streaming_collage(image_files, OUTPUT_FILE, IMAGES_PER_ROW, TARGET_WIDTH, PADDING)
+    else:
+        create_smart_collage(image_files, OUTPUT_FILE, IMAGES_PER_ROW, TARGET_WIDTH, PADDING)
\ No newline at end of file